@@ -5,4 +5,21 @@ python manage.py migrate
 
 python manage.py collectstatic --noinput
 
-gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
+# Метрики запросов воркеров (core.metrics) считаются с нуля при старте.
+if [ -n "$METRICS_DIR" ]; then
+    rm -rf "$METRICS_DIR"
+    mkdir -p "$METRICS_DIR"
+fi
+
+# SERVER_MODE=wsgi (по умолчанию) - синхронные воркеры gunicorn,
+# SERVER_MODE=asgi - воркеры uvicorn с асинхронными представлениями чтения.
+case "${SERVER_MODE:-wsgi}" in
+    asgi)
+        export ASYNC_READ_VIEWS="${ASYNC_READ_VIEWS:-true}"
+        exec gunicorn foodgram.asgi:application \
+            -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
+        ;;
+    *)
+        exec gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
+        ;;
+esac
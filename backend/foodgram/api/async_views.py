@@ -0,0 +1,166 @@
+"""
+Асинхронное чтение для ViewSet'ов API.
+
+AsyncReadMixin повторяет list и retrieve DRF (alist, aretrieve) с
+загрузкой данных через асинхронный ORM Django. Фильтры, пагинация,
+сериализаторы, права и кэши берутся у того же ViewSet, поэтому ответы
+совпадают с синхронными. При ASYNC_READ_VIEWS = True (см. api.urls)
+GET и HEAD этих маршрутов обслуживаются асинхронно, остальные методы
+по-прежнему синхронным ViewSet в потоке.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.urls import URLPattern
+
+
+ASYNC_METHODS = ("GET", "HEAD")
+
+
+class AsyncReadMixin:
+    """
+    Асинхронные alist и aretrieve для ViewSet. Миксины кэшей и связей
+    пользователя (CatalogCacheMixin, AnonymousResponseCacheMixin,
+    ViewerRelationsMixin) переопределяют их так же, как list и retrieve.
+    """
+
+    async_actions = ("list", "retrieve")
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Аналог APIView.dispatch для асинхронного действия."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.action = self.action_map["get"]
+        self.headers = self.default_response_headers
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, f"a{self.action}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response.render()
+
+    async def aperform_authentication(self, request):
+        """
+        Аналог Request._authenticate: аутентификаторы с методом
+        aauthenticate вызываются напрямую, остальные - в потоке.
+        """
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, "aauthenticate", None)
+            if authenticate is None:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = await self.aget_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        objects = [obj async for obj in queryset]
+        serializer = await self.aget_serializer(objects, many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = await self.aget_serializer(instance)
+        return Response(serializer.data)
+
+    async def afilter_queryset(self, queryset):
+        """
+        Фильтры могут выполнять запросы при построении queryset
+        (например, поиск по ингредиентам), поэтому работают в потоке.
+        """
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (
+            queryset.model.DoesNotExist,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def aget_serializer(self, *args, **kwargs):
+        return self.get_serializer(*args, **kwargs)
+
+
+def async_read_view(callback):
+    """
+    Представление маршрута ViewSet: GET и HEAD выполняются асинхронным
+    действием, остальные методы передаются исходному представлению.
+    """
+    viewset, actions = callback.cls, callback.actions
+    sync_view = sync_to_async(callback)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ASYNC_METHODS:
+            return await sync_view(request, *args, **kwargs)
+        self = viewset(**callback.initkwargs)
+        self.action_map = actions
+        return await self.adispatch(request, *args, **kwargs)
+
+    view.cls = viewset
+    view.initkwargs = callback.initkwargs
+    view.actions = actions
+    view.csrf_exempt = True
+    return view
+
+
+def async_read_urls(urls: list) -> list:
+    """
+    Заменяет представления маршрутов роутера, у которых GET обслуживает
+    действие из AsyncReadMixin.async_actions, на async_read_view.
+    """
+    patterns = []
+    for url in urls:
+        viewset = getattr(url.callback, "cls", None)
+        actions = getattr(url.callback, "actions", None) or {}
+        if (
+            isinstance(url, URLPattern)
+            and viewset is not None
+            and issubclass(viewset, AsyncReadMixin)
+            and actions.get("get") in viewset.async_actions
+        ):
+            url = URLPattern(
+                url.pattern,
+                async_read_view(url.callback),
+                url.default_args,
+                url.name,
+            )
+        patterns.append(url)
+    return patterns
@@ -0,0 +1,204 @@
+import hashlib
+import threading
+
+from rest_framework import authentication, exceptions, permissions
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """
+    Аутентификация по токену из заголовка «Authorization: Token <ключ>».
+    Для асинхронных представлений (api.async_views) токен проверяется
+    через асинхронный ORM методом aauthenticate.
+    """
+
+    def authenticate(self, request):
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    def get_token_key(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _("Invalid token header. No credentials provided.")
+            )
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _(
+                    "Invalid token header. "
+                    "Token string should not contain spaces."
+                )
+            )
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _(
+                    "Invalid token header. "
+                    "Token string should not contain invalid characters."
+                )
+            )
+
+    def authenticate_credentials(self, key):
+        return self.check_token(self.load_token(key))
+
+    async def aauthenticate_credentials(self, key):
+        return self.check_token(await self.aload_token(key))
+
+    def load_token(self, key):
+        model = self.get_model()
+        try:
+            return model.objects.select_related("user").get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+    async def aload_token(self, key):
+        model = self.get_model()
+        try:
+            return await model.objects.select_related("user").aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+    def check_token(self, token):
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return token.user, token
+
+
+# Отметка отозванного токена: пока она в кэше, токен не кэшируется.
+REVOKED = "revoked"
+
+
+class TokenCache:
+    """
+    Кэш токенов с пользователями в кэше Django.
+
+    При отзыве токена (выход, смена пароля, деактивация, см. api.signals)
+    запись заменяется отметкой REVOKED на время жизни записи, а новые
+    записи добавляются через add. Поэтому запрос, прочитавший токен
+    из базы до отзыва, не вернёт его в кэш. Счётчики попаданий
+    и промахов ведутся в памяти процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cache(self):
+        return caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+
+    @property
+    def enabled(self) -> bool:
+        return settings.AUTH_TOKEN_CACHE_TIMEOUT > 0
+
+    def make_key(self, key: str) -> str:
+        return "auth-token:" + hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key: str):
+        return self.count(self.cache.get(self.make_key(key)))
+
+    async def aget(self, key: str):
+        return self.count(await self.cache.aget(self.make_key(key)))
+
+    def count(self, token):
+        if token == REVOKED:
+            token = None
+        with self._lock:
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return token
+
+    def add(self, token) -> None:
+        self.cache.add(
+            self.make_key(token.key), token, settings.AUTH_TOKEN_CACHE_TIMEOUT
+        )
+
+    async def aadd(self, token) -> None:
+        await self.cache.aadd(
+            self.make_key(token.key), token, settings.AUTH_TOKEN_CACHE_TIMEOUT
+        )
+
+    def evict(self, *keys: str) -> None:
+        if not keys or not self.enabled:
+            return
+        self.cache.set_many(
+            {self.make_key(key): REVOKED for key in keys},
+            settings.AUTH_TOKEN_CACHE_TIMEOUT,
+        )
+        with self._lock:
+            self.evictions += len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который берёт токен с пользователем из TokenCache
+    и обращается к базе только при промахе. Время жизни записи задаёт
+    AUTH_TOKEN_CACHE_TIMEOUT (0 - без кэша).
+
+    Кэш используется только для безопасных методов: изменяющий запрос
+    может сохранить request.user целиком, и пользователь из кэша затёр бы
+    изменения, сделанные после его кэширования (например, счётчики).
+    """
+
+    token_cache = token_cache
+
+    def use_cache(self, request) -> bool:
+        return (
+            self.token_cache.enabled
+            and request.method in permissions.SAFE_METHODS
+        )
+
+    def authenticate(self, request):
+        if not self.use_cache(request):
+            return super().authenticate(request)
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+        token = self.token_cache.get(key)
+        if token is None:
+            token = self.load_token(key)
+            self.token_cache.add(token)
+        return self.check_token(token)
+
+    async def aauthenticate(self, request):
+        if not self.use_cache(request):
+            return await super().aauthenticate(request)
+        key = self.get_token_key(request)
+        if key is None:
+            return None
+        token = await self.token_cache.aget(key)
+        if token is None:
+            token = await self.aload_token(key)
+            await self.token_cache.aadd(token)
+        return self.check_token(token)
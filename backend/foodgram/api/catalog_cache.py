@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.utils.http import parse_etags
+
+from food.generations import catalog_generation
+
+
+class LocalResponseCache:
+    """
+    Кэш данных ответов в памяти процесса с вытеснением давно не
+    запрашивавшихся записей. Запись действительна только для того
+    поколения справочников, при котором была сохранена.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, version: int, data) -> None:
+        with self._lock:
+            self._entries[key] = (version, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CatalogCacheMixin:
+    """
+    Отдаёт list и retrieve справочников из кэша процесса по номеру
+    поколения справочников, который меняется при сохранении или удалении
+    тега или ингредиента (см. food.signals).
+
+    Ответы получают сильный ETag; повторный запрос с совпадающим
+    If-None-Match получает 304 без обращения к базе и сериализатору.
+    alist и aretrieve делают то же для асинхронных представлений.
+    """
+
+    catalog_generation = catalog_generation
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.catalog_cache = LocalResponseCache(
+            settings.CATALOG_CACHE_MAX_ENTRIES
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalog_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acatalog_response(
+            super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acatalog_response(
+            super().aretrieve, request, *args, **kwargs
+        )
+
+    def catalog_response(self, handler, request, *args, **kwargs):
+        version = self.catalog_generation.get()
+        key, etag, response = self.cached_catalog_response(
+            request, kwargs, version
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            self.catalog_cache.set(key, version, response.data)
+        return self.with_catalog_headers(response, etag)
+
+    async def acatalog_response(self, handler, request, *args, **kwargs):
+        version = await self.catalog_generation.aget()
+        key, etag, response = self.cached_catalog_response(
+            request, kwargs, version
+        )
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            self.catalog_cache.set(key, version, response.data)
+        return self.with_catalog_headers(response, etag)
+
+    def cached_catalog_response(self, request, kwargs, version) -> tuple:
+        """
+        Возвращает ключ кэша, ETag и готовый ответ: 304 при совпадении
+        If-None-Match, данные из кэша или None, если их нужно получить.
+        """
+        key = self.get_catalog_cache_key(request, kwargs)
+        etag = '"{}-{}"'.format(
+            version, hashlib.sha1(key.encode()).hexdigest()[:16]
+        )
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return key, etag, Response(status=status.HTTP_304_NOT_MODIFIED)
+        data = self.catalog_cache.get(key, version)
+        return key, etag, None if data is None else Response(data)
+
+    def with_catalog_headers(self, response, etag: str):
+        response["ETag"] = etag
+        response["Cache-Control"] = (
+            f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}"
+        )
+        return response
+
+    def get_catalog_cache_key(self, request, kwargs) -> str:
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        return repr((self.action, sorted(kwargs.items()), params))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+@checks.register(checks.Tags.caches)
+def check_token_cache_backend(app_configs, **kwargs):
+    """
+    Кэш токенов требует общего для процессов бэкенда кэша: иначе отзыв
+    токена (выход, смена пароля) не виден другим воркерам.
+    """
+    if settings.AUTH_TOKEN_CACHE_TIMEOUT <= 0:
+        return []
+    if not isinstance(caches[settings.AUTH_TOKEN_CACHE_ALIAS], LocMemCache):
+        return []
+    return [
+        checks.Error(
+            "Кэш токенов (AUTH_TOKEN_CACHE_TIMEOUT) включён с кэшем locmem, "
+            "отдельным у каждого процесса.",
+            hint=(
+                "Укажите CACHE_BACKEND=memcached (или file для одного "
+                "сервера) либо AUTH_TOKEN_CACHE_TIMEOUT=0."
+            ),
+            id="api.E001",
+        )
+    ]
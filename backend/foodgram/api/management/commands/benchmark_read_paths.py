@@ -0,0 +1,282 @@
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from food.models import Recipe
+
+
+# Серверы для --spawn: одна и та же база, разные воркеры gunicorn.
+SERVERS = {
+    "sync": ("foodgram.wsgi:application", "sync", "false"),
+    "async": (
+        "foodgram.asgi:application",
+        "uvicorn.workers.UvicornWorker",
+        "true",
+    ),
+}
+
+
+class HTTPConnection:
+    """Соединение HTTP/1.1 с keep-alive поверх asyncio-потоков."""
+
+    def __init__(self, host: str, port: int, headers: dict):
+        self.host = host
+        self.port = port
+        self.headers = "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        )
+        self.reader = self.writer = None
+
+    async def get(self, path: str) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        self.writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"{self.headers}\r\n"
+            ).encode()
+        )
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Сервер закрыл соединение.")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            await self.read_chunked()
+        else:
+            await self.reader.readexactly(
+                int(headers.get("content-length", 0))
+            )
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status
+
+    async def read_chunked(self):
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            await self.reader.readexactly(size + 2)
+            if not size:
+                return
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_load(
+    url: str, path: str, headers: dict, concurrency: int, duration: float
+) -> dict:
+    """
+    Нагружает url + path: concurrency соединений последовательно
+    отправляют запросы в течение duration секунд.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path.rstrip("/") + path
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        nonlocal errors
+        connection = HTTPConnection(host, port, headers)
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                status = await connection.get(path)
+            except (OSError, ValueError, IndexError, EOFError):
+                connection.close()
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            latencies.append(time.monotonic() - started)
+        connection.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    return summarize(latencies, errors, elapsed)
+
+
+async def probe(host: str, port: int):
+    connection = HTTPConnection(host, port, {})
+    try:
+        await connection.get("/api/tags/")
+    finally:
+        connection.close()
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100)
+        p50, p99 = cuts[49], cuts[98]
+    else:
+        p50 = p99 = latencies[0] if latencies else 0.0
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": p50 * 1000,
+        "p99": p99 * 1000,
+        "errors": errors,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения синхронного (WSGI) и асинхронного (ASGI)
+    обслуживания запросов чтения на одной базе.
+    """
+
+    help = (
+        "Нагружает эндпоинты чтения на двух серверах (--sync-url и "
+        "--async-url) и выводит запросы в секунду, p50, p99 и ошибки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync-url",
+            default="http://127.0.0.1:8000",
+            help="Адрес сервера с синхронными воркерами.",
+        )
+        parser.add_argument(
+            "--async-url",
+            default="http://127.0.0.1:8001",
+            help="Адрес сервера с ASGI-воркерами.",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help=(
+                "Путь для нагрузки, можно указать несколько раз. "
+                "По умолчанию список рецептов, рецепт, теги, ингредиенты "
+                "и подписки (с --token)."
+            ),
+        )
+        parser.add_argument(
+            "--token",
+            help="Токен пользователя для заголовка Authorization.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Количество одновременных соединений.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10,
+            help="Длительность нагрузки на каждый путь, с.",
+        )
+        parser.add_argument(
+            "--spawn",
+            action="store_true",
+            help=(
+                "Запустить оба сервера gunicorn на портах из --sync-url "
+                "и --async-url и остановить их после замера."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Количество воркеров gunicorn для --spawn.",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or self.default_paths(options["token"])
+        headers = {"Accept": "application/json"}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        urls = {"sync": options["sync_url"], "async": options["async_url"]}
+
+        servers = []
+        try:
+            if options["spawn"]:
+                for mode, url in urls.items():
+                    servers.append(self.spawn(mode, url, options["workers"]))
+            self.stdout.write(
+                f"{'путь':<32} {'режим':<6} {'rps':>8} {'p50, мс':>8} "
+                f"{'p99, мс':>8} {'ошибки':>7}"
+            )
+            for path in paths:
+                for mode, url in urls.items():
+                    result = asyncio.run(
+                        run_load(
+                            url,
+                            path,
+                            headers,
+                            options["concurrency"],
+                            options["duration"],
+                        )
+                    )
+                    self.stdout.write(
+                        f"{path:<32} {mode:<6} {result['rps']:8.1f} "
+                        f"{result['p50']:8.1f} {result['p99']:8.1f} "
+                        f"{result['errors']:7d}"
+                    )
+        finally:
+            for server in servers:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+
+    def default_paths(self, token) -> list:
+        paths = ["/api/recipes/"]
+        recipe_id = Recipe.objects.values_list("id", flat=True).first()
+        if recipe_id is not None:
+            paths.append(f"/api/recipes/{recipe_id}/")
+        paths += ["/api/tags/", "/api/ingredients/"]
+        if token:
+            paths.append("/api/users/subscriptions/")
+        return paths
+
+    def spawn(self, mode: str, url: str, workers: int):
+        application, worker_class, async_views = SERVERS[mode]
+        parts = urlsplit(url)
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                application,
+                "--bind",
+                f"{parts.hostname}:{parts.port}",
+                "--workers",
+                str(workers),
+                "-k",
+                worker_class,
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "ASYNC_READ_VIEWS": async_views},
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Сервер {mode} завершился при запуске.")
+            try:
+                asyncio.run(probe(parts.hostname, parts.port))
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"Сервер {mode} не ответил за 30 с.")
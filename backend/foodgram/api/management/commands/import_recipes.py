@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recipe_import import DEFAULT_CHUNK_SIZE, RecipeImporter
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Команда для массового импорта рецептов из файла NDJSON.
+    """
+
+    help = (
+        "Импортирует рецепты из NDJSON (одна JSON-запись рецепта в строке, "
+        "как в теле POST /api/recipes/)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Путь к файлу NDJSON или - для чтения из stdin."
+        )
+        parser.add_argument(
+            "--author",
+            required=True,
+            help="Email автора импортируемых рецептов.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Количество рецептов, сохраняемых одной порцией.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.IMAGE_PROCESSING_WORKERS, 1),
+            help="Количество процессов для декодирования изображений.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(email=options["author"])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['author']} не найден.")
+
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            importer = RecipeImporter(
+                author, chunk_size=options["chunk_size"], executor=executor
+            )
+            if options["path"] == "-":
+                report = importer.run(sys.stdin.buffer)
+            else:
+                with open(options["path"], "rb") as file:
+                    report = importer.run(file)
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"Строка {error['line']}: "
+                f"{json.dumps(error['errors'], ensure_ascii=False)}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано записей: {report['processed']}, "
+                f"создано рецептов: {report['created']}, "
+                f"с ошибками: {report['failed']}, "
+                f"{report['seconds']} с "
+                f"({report['records_per_second']} записей/с)."
+            )
+        )
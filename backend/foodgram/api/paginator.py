@@ -1,5 +1,159 @@
+import base64
+import json
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 
 class LimitPageNumberPaginator(PageNumberPagination):
     page_size_query_param = "limit"
+
+
+class KeysetPageNumberPaginator(LimitPageNumberPaginator):
+    """
+    Постраничная навигация по номеру страницы (?page=&limit=), а при
+    наличии параметра ``cursor`` - по ключу без COUNT(*) и OFFSET.
+
+    В режиме курсора страница выбирается условием по упорядочивающим
+    полям ``keyset_ordering`` представления, последнее из которых должно
+    быть уникальным. Первая страница запрашивается пустым ``?cursor=``,
+    следующая - по ссылке ``next`` из ответа.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор."
+    default_keyset_ordering = ("-pub_date", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+        queryset, page_size = self.keyset_queryset(queryset, request, view)
+        return self.keyset_page(list(queryset[:page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        То же для асинхронных представлений: COUNT(*) и строки страницы
+        загружаются через асинхронный ORM.
+        """
+        if self.cursor_query_param in request.query_params:
+            queryset, page_size = self.keyset_queryset(
+                queryset, request, view
+            )
+            rows = [row async for row in queryset[:page_size + 1]]
+            return self.keyset_page(rows, page_size)
+
+        self.keyset = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.page.object_list = [row async for row in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+    def keyset_queryset(self, queryset, request, view) -> tuple:
+        """
+        Упорядочивает queryset по полям курсора и отбирает строки после
+        курсора. Возвращает queryset и размер страницы.
+        """
+        self.keyset = True
+        self.request = request
+        self.ordering = getattr(
+            view, "keyset_ordering", self.default_keyset_ordering
+        )
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = queryset.filter(
+                self.keyset_filter(self.decode_cursor(cursor))
+            )
+        return queryset, self.get_page_size(request)
+
+    def keyset_page(self, rows: list, page_size: int) -> list:
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [getattr(last, field.lstrip("-")) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(values)
+        )
+
+    def keyset_filter(self, values):
+        """
+        Условие «строго после» для набора значений упорядочивающих полей:
+        (a < x) OR (a = x AND b < y) для убывающего порядка.
+        """
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": values[position]})
+            for previous, value in zip(self.ordering[:position], values):
+                step &= Q(**{previous.lstrip("-"): value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, values):
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in values
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return [self.decode_value(value) for value in values]
+
+    def decode_value(self, value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return parse_datetime(value) or value
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,246 @@
+"""
+Массовый импорт рецептов из NDJSON: одна JSON-запись рецепта в строке,
+в том же формате, что и тело POST /api/recipes/.
+
+Записи проверяются правилами RecipeSerializer по справочникам, загруженным
+в память один раз, изображения декодируются в пуле процессов, а рецепты,
+их ингредиенты и теги сохраняются порциями через bulk_create; если порция
+не сохранилась, её записи сохраняются по одной. Ошибка в записи попадает
+в отчёт и не прерывает импорт остальных.
+"""
+import json
+import time
+from collections import Counter
+from concurrent.futures import Executor
+from functools import partial
+from typing import Iterable, Optional
+
+from rest_framework import exceptions, serializers
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from api.serializers import RecipeSerializer
+from food import counters
+from food.generations import recipe_generation
+from food.images import import_image, schedule_derivatives
+from food.models import Ingredient, Recipe, RecipeIngredient, Tag
+from food.uploads import parse_data_uri
+from users.models import User
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class Catalog:
+    """Теги и ингредиенты, загруженные в память одним запросом на модель."""
+
+    def __init__(self):
+        self.objects = {
+            Tag: Tag.objects.in_bulk(),
+            Ingredient: Ingredient.objects.in_bulk(),
+        }
+
+    def in_bulk(self, model, ids):
+        objects = self.objects[model]
+        return {pk: objects[pk] for pk in ids if pk in objects}
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    """
+    Правила RecipeSerializer для записи импорта. Изображение только
+    проверяется по заголовку и размеру: декодирует его пул процессов.
+    """
+
+    image = serializers.CharField()
+
+    def validate_image(self, value):
+        try:
+            parse_data_uri(value, settings.IMAGE_UPLOAD_MAX_BYTES)
+        except ValueError as error:
+            raise exceptions.ValidationError(str(error))
+        return value
+
+
+class RecipeImporter:
+    """
+    Импортирует поток строк NDJSON от имени автора author.
+    При переданном executor изображения декодируются в нём.
+    """
+
+    def __init__(
+        self,
+        author: User,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        executor: Optional[Executor] = None,
+    ):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.executor = executor
+        self.catalog = Catalog()
+        self.created = 0
+        self.errors = []
+        self.processed = 0
+        self.seconds = 0.0
+
+    def run(self, lines: Iterable) -> dict:
+        started = time.perf_counter()
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            self.processed += 1
+            data = self.validate(number, line)
+            if data is None:
+                continue
+            batch.append((number, data))
+            if len(batch) >= self.chunk_size:
+                self.save(batch)
+                batch = []
+        if batch:
+            self.save(batch)
+        self.seconds = time.perf_counter() - started
+        return self.report()
+
+    def validate(self, number: int, line) -> Optional[dict]:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode()
+            record = json.loads(line)
+        except ValueError as error:
+            # UnicodeDecodeError тоже ValueError: ошибка только этой строки.
+            self.errors.append({"line": number, "errors": str(error)})
+            return None
+        serializer = RecipeImportSerializer(
+            data=record, context={"catalog": self.catalog}
+        )
+        if not serializer.is_valid():
+            self.errors.append({"line": number, "errors": serializer.errors})
+            return None
+        return serializer.validated_data
+
+    def decode_images(self, images: list) -> list:
+        """
+        Декодирует изображения порции; вместо результата с ошибкой
+        возвращает исключение.
+        """
+        decode = partial(
+            import_image,
+            media_root=default_storage.path(""),
+            max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES,
+            max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS,
+        )
+        if self.executor is None:
+            futures = None
+        else:
+            futures = [self.executor.submit(decode, image) for image in images]
+        results = []
+        for index, image in enumerate(images):
+            try:
+                if futures is None:
+                    results.append(decode(image))
+                else:
+                    results.append(futures[index].result())
+            except Exception as error:
+                results.append(error)
+        return results
+
+    def save(self, batch: list) -> None:
+        images = self.decode_images([data["image"] for _, data in batch])
+        recipes, records = [], []
+        for (number, data), image in zip(batch, images):
+            if isinstance(image, Exception):
+                self.errors.append(
+                    {"line": number, "errors": {"image": [str(image)]}}
+                )
+                continue
+            recipes.append(
+                Recipe(
+                    author=self.author,
+                    name=data["name"],
+                    text=data["text"],
+                    cooking_time=data["cooking_time"],
+                    **image,
+                )
+            )
+            records.append((number, data))
+        if not recipes:
+            return
+        try:
+            with transaction.atomic():
+                self.save_recipes(recipes, [data for _, data in records])
+        except Exception:
+            # Порция откатилась целиком: записи сохраняются по одной,
+            # чтобы ошибку получила только строка, которая её вызвала.
+            self.save_each(recipes, records)
+            return
+        self.created += len(recipes)
+
+    def save_each(self, recipes: list, records: list) -> None:
+        for recipe, (number, data) in zip(recipes, records):
+            recipe.pk = None
+            try:
+                with transaction.atomic():
+                    self.save_recipes([recipe], [data])
+            except Exception as error:
+                default_storage.delete(recipe.image.name)
+                self.errors.append({"line": number, "errors": str(error)})
+            else:
+                self.created += 1
+
+    def save_recipes(self, recipes: list, records: list) -> None:
+        Recipe.objects.bulk_create(recipes)
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(recipe=recipe, **ingredient)
+                for recipe, data in zip(recipes, records)
+                for ingredient in data["ingredients"]
+            ],
+            batch_size=self.chunk_size,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe=recipe, tag=tag)
+                for recipe, data in zip(recipes, records)
+                for tag in data["tags"]
+            ],
+            batch_size=self.chunk_size,
+        )
+
+        counters.adjust(User, [self.author.pk], "recipes_count", len(recipes))
+        usage = Counter(
+            ingredient["ingredient"].pk
+            for data in records
+            for ingredient in data["ingredients"]
+        )
+        for uses in sorted(set(usage.values())):
+            counters.adjust(
+                Ingredient,
+                [pk for pk, count in usage.items() if count == uses],
+                "usage_count",
+                uses,
+            )
+
+        transaction.on_commit(recipe_generation.bump)
+        for recipe in recipes:
+            transaction.on_commit(
+                partial(
+                    schedule_derivatives,
+                    recipe.pk,
+                    recipe.image.name,
+                    self.executor,
+                )
+            )
+
+    def report(self) -> dict:
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "failed": len(self.errors),
+            "seconds": round(self.seconds, 3),
+            "records_per_second": (
+                round(self.processed / self.seconds, 1) if self.seconds else 0
+            ),
+            "errors": self.errors,
+        }
@@ -1,22 +1,48 @@
+from rest_framework import serializers
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST,)
 
-from django.db.models import Sum
+from django.db import transaction
 from django.db.utils import IntegrityError
 from django.shortcuts import get_object_or_404
 
-from food.models import RecipeIngredient, ShoppingCart
+from food import counters, shopping_list
+from food.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import User
+
+
+BULK_MAX_RECIPES = 100
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_RECIPES,
+    )
 
 
 class RelationHandler:
     add_serializer: ModelSerializer
 
+    # Счётчик рецепта, который меняют массовые операции со связями.
+    relation_counters = {
+        FavoriteRecipe: "favorites_count",
+        ShoppingCart: "in_carts_count",
+    }
+
     def _create_relation(self, model_class, obj_id, user):
         obj = get_object_or_404(self.queryset, pk=obj_id)
         try:
-            model_class.objects.create(recipe=obj, user=user)
+            with transaction.atomic():
+                self._lock_user(user)
+                model_class.objects.create(recipe=obj, user=user)
+                if model_class is ShoppingCart:
+                    shopping_list.add_recipe(user.pk, obj.pk)
         except IntegrityError:
             return Response(
                 {"error": "Рецепт уже был добавлен."},
@@ -27,11 +53,15 @@ class RelationHandler:
         return Response(serializer.data, status=HTTP_201_CREATED)
 
     def _delete_relation(self, model_class, user, pk):
-        try:
-            obj = model_class.objects.get(recipe__id=pk, user=user)
-            obj.delete()
-
-        except model_class.DoesNotExist:
+        with transaction.atomic():
+            self._lock_user(user)
+            deleted, _ = model_class.objects.filter(
+                recipe__id=pk, user=user
+            ).delete()
+            if deleted and model_class is ShoppingCart:
+                shopping_list.remove_recipe(user.pk, pk)
+
+        if not deleted:
             return Response(
                 {"error": f"{model_class.__name__} не существует"},
                 status=HTTP_400_BAD_REQUEST,
@@ -39,27 +69,120 @@ class RelationHandler:
 
         return Response(status=HTTP_204_NO_CONTENT)
 
+    def _bulk_create_relations(self, model_class, data, user):
+        """
+        Добавляет связи пользователя с несколькими рецептами одним
+        INSERT и возвращает результат по каждому id:
+        added, exists или not_found.
+        """
+        serializer = RecipeIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+
+        with transaction.atomic():
+            self._lock_user(user)
+            found = set(
+                Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                    "pk", flat=True
+                )
+            )
+            existing = set(
+                model_class.objects.filter(
+                    user=user, recipe_id__in=found
+                ).values_list("recipe_id", flat=True)
+            )
+            added = [pk for pk in recipe_ids if pk in found - existing]
+            model_class.objects.bulk_create(
+                [model_class(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            self._relations_changed(model_class, user, added, 1)
+
+        statuses = {pk: "added" for pk in added}
+        statuses.update({pk: "exists" for pk in existing})
+        return self._bulk_response(recipe_ids, statuses)
+
+    def _bulk_delete_relations(self, model_class, data, user):
+        """
+        Удаляет связи пользователя с несколькими рецептами
+        и возвращает результат по каждому id: removed или not_found.
+        """
+        serializer = RecipeIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+
+        with transaction.atomic():
+            self._lock_user(user)
+            relations = model_class.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            )
+            removed = list(
+                relations.order_by().values_list("recipe_id", flat=True)
+            )
+            with counters.suppressed():
+                relations.delete()
+            self._relations_changed(model_class, user, removed, -1)
+
+        return self._bulk_response(
+            recipe_ids, {pk: "removed" for pk in removed}
+        )
+
+    def _clear_relations(self, model_class, user):
+        """
+        Удаляет все связи пользователя.
+        """
+        with transaction.atomic():
+            self._lock_user(user)
+            relations = model_class.objects.filter(user=user)
+            removed = list(
+                relations.order_by().values_list("recipe_id", flat=True)
+            )
+            with counters.suppressed():
+                relations.delete()
+            counters.adjust(
+                Recipe, removed, self.relation_counters[model_class], -1
+            )
+            if model_class is ShoppingCart:
+                shopping_list.clear(user.pk)
+        return Response(status=HTTP_204_NO_CONTENT)
 
-def create_shopping_cart(user):
-    shopping_cart = []
-
-    shopping_carts = ShoppingCart.objects.filter(user=user)
-    if not shopping_carts.exists():
-        return shopping_cart
-
-    recipe_ingredients = RecipeIngredient.objects.filter(
-        recipe__shopping_recipe__user=user
-    )
-
-    ingredients = recipe_ingredients.values(
-        "ingredient__name", "ingredient__measurement_unit"
-    ).annotate(amount=Sum("amount"))
-
-    shopping_cart = [
-        f'{ing["ingredient__name"]}: \
-        {ing["amount"]} - \
-            {ing["ingredient__measurement_unit"]}.\n\n'
-        for ing in ingredients
-    ]
-
-    return shopping_cart
+    def _relations_changed(self, model_class, user, recipe_ids, delta):
+        """
+        Обновляет счётчики рецептов и список покупок после массового
+        изменения связей (bulk_create не отправляет сигналы, а при
+        удалении счётчики сигналами не меняются, см. counters.suppressed).
+        """
+        if not recipe_ids:
+            return
+        counters.adjust(
+            Recipe, recipe_ids, self.relation_counters[model_class], delta
+        )
+        if model_class is ShoppingCart:
+            if delta > 0:
+                shopping_list.add_recipes(user.pk, recipe_ids)
+            else:
+                shopping_list.remove_recipes(user.pk, recipe_ids)
+
+    @staticmethod
+    def _lock_user(user):
+        """
+        Блокирует строку пользователя до конца транзакции, чтобы
+        параллельные операции со связями (одиночные и массовые)
+        не посчитали одну связь дважды.
+        """
+        list(
+            User.objects.select_for_update()
+            .filter(pk=user.pk)
+            .values_list("pk", flat=True)
+        )
+
+    @staticmethod
+    def _bulk_response(recipe_ids, statuses):
+        return Response(
+            {
+                "results": [
+                    {"id": pk, "status": statuses.get(pk, "not_found")}
+                    for pk in recipe_ids
+                ]
+            }
+        )
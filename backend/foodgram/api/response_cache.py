@@ -0,0 +1,152 @@
+import hashlib
+import threading
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+from food.generations import Generation, recipe_generation
+
+
+class ResponseCache:
+    """
+    Кэш данных ответов для анонимных пользователей в кэше Django.
+
+    В ключ входят действие, аргументы адреса, нормализованные параметры
+    запроса и номер поколения данных, поэтому после изменения данных
+    старые записи просто перестают запрашиваться и истекают по таймауту.
+    Счётчики попаданий и промахов ведутся в памяти процесса.
+    """
+
+    def __init__(self, prefix: str, generation: Generation):
+        self.prefix = prefix
+        self.generation = generation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    def make_key(self, request, action: str, kwargs: dict) -> str:
+        return self.build_key(request, action, kwargs, self.generation.get())
+
+    async def amake_key(self, request, action: str, kwargs: dict) -> str:
+        return self.build_key(
+            request, action, kwargs, await self.generation.aget()
+        )
+
+    def build_key(
+        self, request, action: str, kwargs: dict, version: int
+    ) -> str:
+        params = sorted(
+            {
+                (name, value)
+                for name, values in request.query_params.lists()
+                for value in values
+                if not (name == "page" and value == "1")
+            }
+        )
+        raw = repr(
+            (request.get_host(), action, sorted(kwargs.items()), params)
+        )
+        return "response:{}:{}:{}".format(
+            self.prefix, version, hashlib.sha1(raw.encode()).hexdigest()
+        )
+
+    def get(self, key: str):
+        return self.count(self.cache.get(key))
+
+    async def aget(self, key: str):
+        return self.count(await self.cache.aget(key))
+
+    def count(self, data):
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key: str, data) -> None:
+        self.cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+
+    async def aset(self, key: str, data) -> None:
+        await self.cache.aset(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+recipe_response_cache = ResponseCache("recipes", recipe_generation)
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Отдаёт list и retrieve анонимным пользователям из ResponseCache.
+    Ответы авторизованным пользователям зависят от пользователя
+    (is_favorited и т. п.) и не кэшируются. alist и aretrieve - то же
+    для асинхронных представлений.
+    """
+
+    response_cache = recipe_response_cache
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.response_cache.make_key(request, self.action, kwargs)
+        data = self.response_cache.get(key)
+        if data is not None:
+            return self.cache_hit(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(key, response.data)
+        return self.cache_miss(response)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        key = await self.response_cache.amake_key(
+            request, self.action, kwargs
+        )
+        data = await self.response_cache.aget(key)
+        if data is not None:
+            return self.cache_hit(data)
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await self.response_cache.aset(key, response.data)
+        return self.cache_miss(response)
+
+    def cache_hit(self, data) -> Response:
+        response = Response(data)
+        response["X-Cache"] = "HIT"
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def cache_miss(self, response) -> Response:
+        response["X-Cache"] = "MISS"
+        patch_vary_headers(response, ("Authorization",))
+        return response
@@ -1,16 +1,25 @@
+import json
+
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_base64.fields import Base64ImageField
 from rest_framework import exceptions, serializers
 
 from django.core.validators import MinValueValidator
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import QueryDict
 
-from food.custom_fields import Hex2NameColor
+from api.viewer_relations import ViewerRelations
+from food import counters, shopping_list
+from food.custom_fields import Base64ImageField, Hex2NameColor, ImageMetaField
 from food.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
                          ShoppingCart, Tag,)
 from users.models import Follow, User
 
 
+# Наибольшее значение PositiveSmallIntegerField во всех поддерживаемых базах.
+SMALL_INTEGER_MAX = 32767
+
+
 class CurrentUserDefaultId(object):
     """
     Класс-фабрика для определения идентификатора текущего пользователя.
@@ -71,6 +80,9 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
+        relations = self.context.get(ViewerRelations.CONTEXT_KEY)
+        if relations is not None:
+            return relations.is_subscribed(obj.pk)
         return Follow.objects.filter(
             user=self.context["request"].user, author=obj
         ).exists()
@@ -81,9 +93,12 @@ class FollowRecipeSerializer(serializers.ModelSerializer):
     Сериализатор для краткой информации о рецепте в подписках.
     """
 
+    image = Base64ImageField(read_only=True, variant="thumbnail")
+    image_meta = ImageMetaField()
+
     class Meta:
         model = Recipe
-        fields = ["id", "name", "image", "cooking_time"]
+        fields = ["id", "name", "image", "image_meta", "cooking_time"]
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -95,7 +110,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         method_name="get_is_subscribed"
     )
     recipes = serializers.SerializerMethodField(method_name="get_recipes")
-    recipes_count = serializers.IntegerField()
+
+    RECIPES_LIMIT = 6
 
     class Meta:
         model = User
@@ -119,14 +135,22 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         user = self.context.get("request").user
         if not user:
             return False
+        relations = self.context.get(ViewerRelations.CONTEXT_KEY)
+        if relations is not None:
+            return relations.is_subscribed(obj.pk)
         return Follow.objects.filter(user=user, author=obj).exists()
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        follow_objects = obj.following.all()
-        subscribed_authors = [follow.author for follow in follow_objects]
-        recipes = Recipe.objects.filter(author__in=subscribed_authors)[:6]
-        context = {"request": request}
+        """
+        Возвращает последние рецепты автора: предзагруженные списком
+        подписок в latest_recipes или, без них, отдельным запросом.
+        """
+        recipes = getattr(obj, "latest_recipes", None)
+        if recipes is None:
+            recipes = obj.recipes.all()[
+                :self.context.get("recipes_limit", self.RECIPES_LIMIT)
+            ]
+        context = {"request": self.context.get("request")}
         return FollowRecipeSerializer(recipes, many=True, context=context).data
 
 
@@ -165,6 +189,7 @@ class RecipeIngredientInputSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ["id", "amount"]
+        extra_kwargs = {"amount": {"max_value": SMALL_INTEGER_MAX}}
 
 
 class TagsSerializer(serializers.ModelSerializer):
@@ -218,17 +243,21 @@ class RecipeListSerializer(serializers.ModelSerializer):
 
     author = CustomUserSerializer(read_only=True)
     tags = TagsSerializer(many=True)
+    image = Base64ImageField(read_only=True, variant="card")
+    image_meta = ImageMetaField()
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     def get_ingredients(self, obj):
-        """Получает значение, указывающее, добавлен ли ингредиент
-        в избранное у пользователя."""
-        ingredients = RecipeIngredient.objects.select_related(
-            "ingredient"
-        ).filter(recipe=obj)
-        serializer = RecipeIngredientSerializer(ingredients, many=True)
+        """Возвращает ингредиенты рецепта с количеством.
+
+        Строки RecipeIngredient берутся из кэша prefetch_related("ingredient"),
+        который заполняет RecipeViewSet, поэтому на странице списка
+        не выполняется отдельный запрос для каждого рецепта."""
+        serializer = RecipeIngredientSerializer(
+            obj.ingredient.all(), many=True
+        )
         return serializer.data
 
     def get_is_favorited(self, obj):
@@ -239,6 +268,10 @@ class RecipeListSerializer(serializers.ModelSerializer):
         if user.is_anonymous:
             return False
 
+        relations = self.context.get(ViewerRelations.CONTEXT_KEY)
+        if relations is not None:
+            return relations.is_favorited(obj.pk)
+
         return FavoriteRecipe.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
@@ -249,11 +282,23 @@ class RecipeListSerializer(serializers.ModelSerializer):
         if user.is_anonymous:
             return False
 
+        relations = self.context.get(ViewerRelations.CONTEXT_KEY)
+        if relations is not None:
+            return relations.is_in_shopping_cart(obj.pk)
+
         return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
 
     class Meta:
         model = Recipe
-        exclude = ("pub_date",)
+        exclude = (
+            "pub_date",
+            "image_width",
+            "image_height",
+            "image_hash",
+            "image_derivatives",
+            "favorites_count",
+            "in_carts_count",
+        )
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -266,72 +311,118 @@ class RecipeSerializer(serializers.ModelSerializer):
     TAGS_VALIDATION_ERROR = "Нужно добавить хотя бы один тег."
     INGREDIENTS_VALIDATION_ERROR = "Нужно добавить хотя бы один ингредиент."
     DUPLICATE_INGREDIENTS_VALIDATION_ERROR = "Ингредиенты не могут повторяться"
-    INGREDIENT_ID_ERROR = "Неверный идентификатор ингредиента."
+    INGREDIENT_ID_ERROR = "Ингредиенты не найдены: {ids}."
+    TAG_ID_ERROR = "Теги не найдены: {ids}."
+    INGREDIENTS_FORMAT_ERROR = (
+        "В multipart-запросе ингредиенты передаются JSON-списком."
+    )
 
-    name = serializers.CharField(required=True, allow_blank=False)
-    text = serializers.CharField(required=True, allow_blank=False)
-    author = AuthorSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    name = serializers.CharField(
+        required=True,
+        allow_blank=False,
+        max_length=Recipe._meta.get_field("name").max_length,
+    )
+    text = serializers.CharField(
+        required=True,
+        allow_blank=False,
+        max_length=Recipe._meta.get_field("text").max_length,
     )
+    author = AuthorSerializer(read_only=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = RecipeIngredientInputSerializer(many=True)
     image = Base64ImageField()
     cooking_time = serializers.IntegerField(
+        max_value=SMALL_INTEGER_MAX,
         validators=(
             MinValueValidator(1, message=COOKING_TIME_VALIDATION_ERROR),
         ),
     )
 
+    def to_internal_value(self, data):
+        """Принимает данные как из JSON, так и из multipart/form-data."""
+        if isinstance(data, QueryDict):
+            data = self.form_data_to_dict(data)
+        return super().to_internal_value(data)
+
+    def form_data_to_dict(self, data):
+        """Приводит multipart/form-data к виду JSON-запроса: теги передаются
+        повторяющимся полем или через запятую, ингредиенты — JSON-строкой,
+        изображение — файлом без base64."""
+        result = {key: data.get(key) for key in data}
+        if "tags" in data:
+            tags = data.getlist("tags")
+            if len(tags) == 1:
+                tags = [tag for tag in tags[0].split(",") if tag.strip()]
+            result["tags"] = tags
+        if "ingredients" in data:
+            try:
+                result["ingredients"] = json.loads(data["ingredients"])
+            except ValueError:
+                raise exceptions.ValidationError(
+                    {"ingredients": [self.INGREDIENTS_FORMAT_ERROR]}
+                )
+        return result
+
+    def in_bulk(self, model, ids):
+        """Теги или ингредиенты по id: из справочника в контексте
+        (массовый импорт, см. api.recipe_import) или одним запросом."""
+        catalog = self.context.get("catalog")
+        if catalog is not None:
+            return catalog.in_bulk(model, ids)
+        return model.objects.in_bulk(ids)
+
     def validate_tags(self, value):
-        """Проверяет, что хотя бы один тег был выбран."""
+        """Проверяет, что хотя бы один тег был выбран, и получает
+        все теги одним запросом."""
         if not value:
             raise exceptions.ValidationError(self.TAGS_VALIDATION_ERROR)
-        return value
+        tag_ids = list(dict.fromkeys(value))
+        tags = self.in_bulk(Tag, tag_ids)
+        missing = [pk for pk in tag_ids if pk not in tags]
+        if missing:
+            raise exceptions.ValidationError(
+                self.TAG_ID_ERROR.format(ids=", ".join(map(str, missing)))
+            )
+        return [tags[pk] for pk in tag_ids]
 
     def validate_ingredients(self, value):
-        """Проверяет, что хотя бы один ингредиент
-        был выбран и нет повторяющихся ингредиентов."""
+        """Проверяет, что хотя бы один ингредиент был выбран
+        и нет повторяющихся ингредиентов, и получает все ингредиенты
+        одним запросом."""
         if not value:
             raise exceptions.ValidationError(self.INGREDIENTS_VALIDATION_ERROR)
 
         ingredient_ids = [item["id"] for item in value]
-        duplicate_ingredient_ids = {
-            id for id in ingredient_ids if ingredient_ids.count(id) > 1
-        }
-
-        if duplicate_ingredient_ids:
+        if len(set(ingredient_ids)) != len(ingredient_ids):
             raise exceptions.ValidationError(
                 self.DUPLICATE_INGREDIENTS_VALIDATION_ERROR
             )
 
-        return value
-
-    @transaction.atomic
-    def get_ingredients_data(self, ingredients):
-        """Получть ингредиенты из запроса."""
-        ingredient_ids = [ingredient["id"] for ingredient in ingredients]
-
-        ingredients_queryset = Ingredient.objects.filter(pk__in=ingredient_ids)
-
-        if not ingredients_queryset.exists():
-            raise exceptions.ValidationError(self.INGREDIENT_ID_ERROR)
-
-        ingredient_data = []
-
-        for ingredient in ingredients:
-            ingredient_id = ingredient["id"]
-            amount = ingredient["amount"]
-
-            ingredient_obj = ingredients_queryset.get(pk=ingredient_id)
-
-            ingredient_data.append(
-                {
-                    "ingredient": ingredient_obj,
-                    "amount": amount,
-                }
+        ingredients = self.in_bulk(Ingredient, ingredient_ids)
+        missing = [pk for pk in ingredient_ids if pk not in ingredients]
+        if missing:
+            raise exceptions.ValidationError(
+                self.INGREDIENT_ID_ERROR.format(
+                    ids=", ".join(map(str, missing))
+                )
             )
 
-        return ingredient_data
+        return [
+            {"ingredient": ingredients[item["id"]], "amount": item["amount"]}
+            for item in value
+        ]
+
+    def create_ingredients(self, recipe, ingredients):
+        """Создаёт строки RecipeIngredient рецепта одним запросом."""
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe=recipe, **data) for data in ingredients]
+        )
+        counters.adjust(
+            Ingredient,
+            [data["ingredient"].pk for data in ingredients],
+            "usage_count",
+            1,
+        )
 
     @transaction.atomic
     def create(self, validated_data):
@@ -342,43 +433,82 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
-
-        ingredient_data = self.get_ingredients_data(ingredients)
-        RecipeIngredient.objects.bulk_create(
-            [
-                RecipeIngredient(recipe=recipe, **data)
-                for data in ingredient_data
-            ]
-        )
+        self.create_ingredients(recipe, ingredients)
 
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """Приводит строки RecipeIngredient рецепта к переданному составу:
+        одним запросом создаёт новые, одним меняет количество у изменённых
+        и одним удаляет лишние. Неизменные строки не трогает."""
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        old_amounts = {pk: row.amount for pk, row in current.items()}
+        incoming = {
+            data["ingredient"].pk: data["amount"] for data in ingredients
+        }
+        to_create = [
+            RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in incoming.items()
+            if pk not in current
+        ]
+        to_update = []
+        for pk, row in current.items():
+            if pk in incoming and row.amount != incoming[pk]:
+                row.amount = incoming[pk]
+                to_update.append(row)
+        removed = [pk for pk in current if pk not in incoming]
+
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+            counters.adjust(
+                Ingredient,
+                [row.ingredient_id for row in to_create],
+                "usage_count",
+                1,
+            )
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ("amount",))
+        if removed:
+            # Счётчик обновляется здесь же одним UPDATE, а не сигналами.
+            with counters.suppressed():
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed
+                ).delete()
+            counters.adjust(Ingredient, removed, "usage_count", -1)
+
+        if to_create or to_update or removed:
+            shopping_list.recipe_changed(recipe.pk, old_amounts, incoming)
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновляет существующий рецепт."""
+        """Обновляет существующий рецепт, меняя только изменившиеся
+        теги и строки ингредиентов."""
         tags = validated_data.pop("tags", None)
         if tags is not None:
             instance.tags.set(tags)
 
         ingredients = validated_data.pop("ingredients", None)
         if ingredients is not None:
-            instance.ingredients.clear()
-
-        ingredient_obj, amount = self.get_ingredients_data(ingredients)
-        RecipeIngredient.objects.update_or_create(
-            recipe=instance,
-            ingredient=ingredient_obj,
-            defaults={"amount": amount},
-        )
+            self.update_ingredients(instance, ingredients)
 
         return super().update(instance, validated_data)
 
-    @transaction.atomic
     def to_representation(self, instance):
-        """Преобразует объект рецепта в его представление."""
-        serializer = RecipeListSerializer(
-            instance, context={"request": self.context.get("request")}
+        """Преобразует объект рецепта в его представление.
+        Теги и ингредиенты загружаются заранее, чтобы ответ на создание
+        рецепта не выполнял запрос на каждый ингредиент."""
+        prefetch_related_objects(
+            [instance],
+            "tags",
+            Prefetch(
+                "ingredient",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
         )
+        serializer = RecipeListSerializer(instance, context=self.context)
         return serializer.data
 
     class Meta:
@@ -398,11 +528,12 @@ class RecipeSerializer(serializers.ModelSerializer):
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для краткого представления рецепта."""
 
-    image = Base64ImageField()
+    image = Base64ImageField(variant="card")
+    image_meta = ImageMetaField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_meta", "cooking_time")
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
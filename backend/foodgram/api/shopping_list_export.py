@@ -0,0 +1,253 @@
+"""
+Выгрузка списка покупок в форматах txt, csv и pdf.
+
+Строки читаются из ShoppingListItem итератором (на PostgreSQL -
+серверным курсором). Выгрузки txt и csv сразу уходят клиенту через
+StreamingHttpResponse, а PDF сначала пишется в файл целиком. Файл
+сохраняется в SHOPPING_LIST_CACHE_DIR под именем из хэша содержимого
+списка, поэтому повторная выгрузка неизменного списка отдаётся с диска.
+Когда кэш превышает SHOPPING_LIST_CACHE_MAX_BYTES, удаляются файлы,
+которые дольше всех не запрашивали.
+"""
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+from food.generations import catalog_generation
+
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении вида выгружаемых файлов.
+EXPORT_VERSION = 1
+ROWS_CHUNK_SIZE = 500
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_MARGIN = 50
+TITLE = "Список покупок"
+CSV_HEADER = ("Ингредиент", "Количество", "Единица измерения")
+# Временные файлы старше этого срока остались от прерванных процессов.
+STALE_TEMP_SECONDS = 3600
+
+
+def render_txt(rows) -> Iterator[bytes]:
+    for name, amount, unit in rows:
+        yield f"{name}: {amount} {unit}\n".encode()
+
+
+class _Line:
+    """Буфер csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows) -> Iterator[bytes]:
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_HEADER).encode()
+    for row in rows:
+        yield writer.writerow(row).encode()
+
+
+def _pdf_font() -> str:
+    """
+    Регистрирует шрифт с кириллицей из SHOPPING_LIST_PDF_FONT.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(path):
+        logger.warning(f"Шрифт {path} не найден, кириллица не отобразится")
+        return "Helvetica"
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows, file) -> None:
+    """
+    Пишет PDF в файл, читая из курсора строки только текущей страницы.
+    Готовые страницы хранятся сжатыми, а reportlab записывает документ
+    целиком при сохранении, поэтому PDF не отдаётся потоком.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(file, pagesize=A4, pageCompression=1)
+    pdf.setTitle(TITLE)
+    font = _pdf_font()
+    _, height = A4
+    top = height - PDF_MARGIN
+
+    pdf.setFont(font, PDF_FONT_SIZE + 4)
+    pdf.drawString(PDF_MARGIN, top, TITLE)
+    pdf.setFont(font, PDF_FONT_SIZE)
+    y = top - 2 * PDF_LINE_HEIGHT
+    for name, amount, unit in rows:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            y = top
+        pdf.drawString(PDF_MARGIN, y, f"{name} - {amount} {unit}")
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+
+
+# Формат: (тип содержимого, функция выгрузки, отдаётся ли потоком).
+# Потоковые функции возвращают части файла, остальные пишут его в файл.
+FORMATS = {
+    "txt": ("text/plain; charset=UTF-8", render_txt, True),
+    "csv": ("text/csv; charset=UTF-8", render_csv, True),
+    "pdf": ("application/pdf", render_pdf, False),
+}
+
+
+class ShoppingListExport:
+    """
+    Выгрузка списка покупок пользователя в одном из форматов FORMATS.
+    """
+
+    def __init__(self, user, export_format: str):
+        self.user = user
+        self.format = export_format
+        self.content_type, self.renderer, self.streaming = FORMATS[
+            export_format
+        ]
+
+    def content_key(self) -> Optional[str]:
+        """
+        Хэш содержимого списка покупок или None для пустого списка.
+        В хэш входит номер поколения справочников, так как в файл
+        попадают названия ингредиентов.
+        """
+        digest = hashlib.sha256(
+            f"{EXPORT_VERSION}:{self.format}:"
+            f"{catalog_generation.get()}".encode()
+        )
+        items = (
+            self.user.shopping_list.order_by("ingredient_id")
+            .values_list("ingredient_id", "total_amount")
+            .iterator(chunk_size=ROWS_CHUNK_SIZE)
+        )
+        empty = True
+        for ingredient_id, amount in items:
+            digest.update(f"{ingredient_id}:{amount};".encode())
+            empty = False
+        return None if empty else digest.hexdigest()
+
+    def rows(self):
+        return (
+            self.user.shopping_list.order_by("ingredient__name")
+            .values_list(
+                "ingredient__name",
+                "total_amount",
+                "ingredient__measurement_unit",
+            )
+            .iterator(chunk_size=ROWS_CHUNK_SIZE)
+        )
+
+    def response(self, key: str, filename: str):
+        path = os.path.join(
+            settings.SHOPPING_LIST_CACHE_DIR, f"{key}.{self.format}"
+        )
+        filename = f"{filename}.{self.format}"
+        try:
+            file = open(path, "rb")
+            # Время изменения файла - время последней выдачи для prune_cache.
+            os.utime(file.fileno())
+        except FileNotFoundError:
+            if self.streaming:
+                response = StreamingHttpResponse(
+                    self._stream_to_cache(path),
+                    content_type=self.content_type,
+                )
+                response["Content-Disposition"] = (
+                    f'attachment; filename="{filename}"'
+                )
+                return response
+            with self._cache_file(path) as file:
+                self.renderer(self.rows(), file)
+            file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type=self.content_type,
+        )
+
+    def _stream_to_cache(self, path: str) -> Iterator[bytes]:
+        """
+        Отдаёт файл по частям и одновременно пишет его в кэш.
+        """
+        with self._cache_file(path) as file:
+            for chunk in self.renderer(self.rows()):
+                file.write(chunk)
+                yield chunk
+        file.close()
+
+    @contextmanager
+    def _cache_file(self, path: str):
+        """
+        Открытый временный файл, который становится записью кэша path
+        только после успешного завершения блока; иначе он удаляется.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        file = os.fdopen(fd, "w+b")
+        try:
+            yield file
+            file.flush()
+            os.replace(temp_path, path)
+        except BaseException:
+            file.close()
+            os.unlink(temp_path)
+            raise
+        prune_cache(directory, settings.SHOPPING_LIST_CACHE_MAX_BYTES)
+
+
+def prune_cache(directory: str, max_bytes: int) -> None:
+    """
+    Удаляет файлы кэша, которые дольше всех не запрашивали, пока общий
+    размер больше max_bytes, и забытые временные файлы. Отдаваемый
+    в этот момент файл остаётся доступен уже открывшему его процессу.
+    """
+    files = []
+    total = 0
+    stale_before = time.time() - STALE_TEMP_SECONDS
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                if stat.st_mtime < stale_before:
+                    remove(entry.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    files.sort()
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        remove(path)
+        total -= size
+
+
+def remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,33 @@
+from rest_framework.authtoken.models import Token
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """
+    Убирает токен из кэша при удалении: выход (CustomTokenDestroyView),
+    удаление в админке или вместе с пользователем.
+    """
+    token_cache.evict(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """
+    Убирает токены пользователя из кэша при сохранении пользователя:
+    смена пароля, деактивация, смена прав. Вход в систему меняет только
+    last_login и кэш не сбрасывает.
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    if not token_cache.enabled or kwargs.get("created"):
+        return
+    token_cache.evict(
+        *Token.objects.filter(user=instance).values_list("key", flat=True)
+    )
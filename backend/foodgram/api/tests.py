@@ -0,0 +1,302 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.recipe_import import RecipeImporter
+from food.models import FavoriteRecipe, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import User
+
+
+ME_URL = "/api/users/me/"
+RECIPES_URL = "/api/recipes/"
+PASSWORD = "Sup3r-secret-pass"
+
+
+def png_data_uri() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    content = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/png;base64,{content}"
+
+
+@override_settings(AUTH_TOKEN_CACHE_TIMEOUT=60)
+class CachedTokenAuthenticationTests(APITestCase):
+    """
+    Кэш токенов: повторный запрос не обращается к таблице токенов,
+    а отозванный токен не принимается.
+    """
+
+    def setUp(self):
+        caches[settings.AUTH_TOKEN_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            first_name="Иван",
+            last_name="Петров",
+            password=PASSWORD,
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def get_me(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(ME_URL)
+        token_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if "authtoken_token" in query["sql"]
+        ]
+        return response, token_queries
+
+    def test_cached_token_skips_database(self):
+        response, token_queries = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_queries), 1)
+
+        response, token_queries = self.get_me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_queries, [])
+
+    def test_logout_rejects_cached_token(self):
+        self.get_me()
+        self.client.post("/api/auth/token/logout/")
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_change_rejects_cached_token(self):
+        self.get_me()
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": PASSWORD, "new_password": "An0ther-pass-42"},
+        )
+        self.assertEqual(response.status_code, 204)
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivation_rejects_cached_token(self):
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, 401)
+
+
+class RecipeImageURLTests(APITestCase):
+    """
+    Ссылка вместо изображения принимается только при изменении рецепта
+    и только на его текущее изображение.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            first_name="Иван",
+            last_name="Петров",
+            password=PASSWORD,
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(name="Обед", color="#00FF00", slug="l")
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+
+    def payload(self, image) -> dict:
+        return {
+            "name": "Суп",
+            "text": "Сварить.",
+            "cooking_time": 10,
+            "tags": [self.tag.id],
+            "ingredients": [{"id": self.ingredient.id, "amount": 5}],
+            "image": image,
+        }
+
+    def test_create_rejects_url(self):
+        response = self.client.post(
+            RECIPES_URL, self.payload("http://evil/x.png"), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_update_keeps_current_image_by_url(self):
+        response = self.client.post(
+            RECIPES_URL, self.payload(png_data_uri()), format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        url = f"{RECIPES_URL}{response.data['id']}/"
+        image = Recipe.objects.get().image.name
+
+        response = self.client.patch(
+            url, self.payload(response.data["image"]), format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Recipe.objects.get().image.name, image)
+
+        response = self.client.patch(
+            url, self.payload("http://evil/x.png"), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Recipe.objects.get().image.name, image)
+
+
+class RelationCountersTests(APITestCase):
+    """
+    Счётчики рецептов после добавления и удаления связей по одной
+    и массово меняются ровно один раз.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            first_name="Иван",
+            last_name="Петров",
+            password=PASSWORD,
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.user,
+                name=f"Рецепт {number}",
+                text="Приготовить.",
+                cooking_time=5,
+                image="recipes/image.png",
+            )
+            for number in range(3)
+        ]
+        self.ids = [recipe.id for recipe in self.recipes]
+        # Связи другого пользователя: счётчик, уменьшенный дважды,
+        # не совпадёт с ожидаемым.
+        other = User.objects.create_user(
+            username="guest",
+            email="guest@example.com",
+            first_name="Пётр",
+            last_name="Иванов",
+            password=PASSWORD,
+        )
+        for recipe in self.recipes:
+            FavoriteRecipe.objects.create(user=other, recipe=recipe)
+            ShoppingCart.objects.create(user=other, recipe=recipe)
+
+    def counts(self, field: str) -> list:
+        return list(
+            Recipe.objects.filter(pk__in=self.ids)
+            .order_by("pk")
+            .values_list(field, flat=True)
+        )
+
+    def test_favorites(self):
+        self.client.post(f"{RECIPES_URL}{self.ids[0]}/favorite/")
+        response = self.client.post(
+            f"{RECIPES_URL}favorite/bulk/", {"recipes": self.ids}, "json"
+        )
+        self.assertEqual(
+            [row["status"] for row in response.data["results"]],
+            ["exists", "added", "added"],
+        )
+        self.assertEqual(self.counts("favorites_count"), [2, 2, 2])
+
+        self.client.delete(f"{RECIPES_URL}{self.ids[0]}/favorite/")
+        self.client.delete(
+            f"{RECIPES_URL}favorite/bulk/", {"recipes": self.ids}, "json"
+        )
+        self.assertEqual(self.counts("favorites_count"), [1, 1, 1])
+
+    def test_shopping_cart_clear(self):
+        self.client.post(
+            f"{RECIPES_URL}shopping_cart/bulk/", {"recipes": self.ids}, "json"
+        )
+        self.assertEqual(self.counts("in_carts_count"), [2, 2, 2])
+        response = self.client.delete(f"{RECIPES_URL}shopping_cart/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts("in_carts_count"), [1, 1, 1])
+
+
+class RecipeImportTests(APITestCase):
+    """Ошибки импорта относятся только к строкам, которые их вызвали."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.author = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            first_name="Иван",
+            last_name="Петров",
+            password=PASSWORD,
+        )
+        self.tag = Tag.objects.create(name="Обед", color="#00FF00", slug="l")
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+
+    def line(self, **fields) -> bytes:
+        record = {
+            "name": "Суп",
+            "text": "Сварить.",
+            "cooking_time": 10,
+            "tags": [self.tag.id],
+            "ingredients": [{"id": self.ingredient.id, "amount": 5}],
+            "image": png_data_uri(),
+            **fields,
+        }
+        return json.dumps(record, ensure_ascii=False).encode() + b"\n"
+
+    def test_model_limits_are_validated(self):
+        report = RecipeImporter(self.author).run(
+            [
+                self.line(),
+                self.line(name="С" * 101),
+                self.line(cooking_time=40000),
+                self.line(
+                    ingredients=[{"id": self.ingredient.id, "amount": 40000}]
+                ),
+            ]
+        )
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            [error["line"] for error in report["errors"]], [2, 3, 4]
+        )
+
+    def test_failed_chunk_is_saved_record_by_record(self):
+        save_recipes = RecipeImporter.save_recipes
+
+        def fail_on_bad_name(importer, recipes, records):
+            if any(recipe.name == "Плохой" for recipe in recipes):
+                raise IntegrityError("ошибка записи")
+            return save_recipes(importer, recipes, records)
+
+        with mock.patch.object(
+            RecipeImporter, "save_recipes", fail_on_bad_name
+        ):
+            report = RecipeImporter(self.author).run(
+                [self.line(), self.line(name="Плохой"), self.line()]
+            )
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(
+            report["errors"], [{"line": 2, "errors": "ошибка записи"}]
+        )
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(Ingredient.objects.get().usage_count, 2)
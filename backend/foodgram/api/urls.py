@@ -1,9 +1,11 @@
 from djoser.views import TokenCreateView
 from rest_framework.routers import DefaultRouter
 
+from django.conf import settings
 from django.urls import include, path
 
-from api.views import (CustomTokenDestroyView, IngredientViewSet,
+from api.async_views import async_read_urls
+from api.views import (CustomTokenDestroyView, IngredientViewSet, MetricsView,
                        RecipeViewSet, SubscriptionListView, TagsViewSet,
                        follow_author,)
 
@@ -21,13 +23,18 @@ router.register(
     basename="subscriptions",
 )
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = async_read_urls(router_urls)
+
 
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(router_urls)),
     path(r"users/<int:pk>/subscribe/", follow_author, name="follow-author"),
     path("auth/token/login/", TokenCreateView.as_view(), name="token_create"),
     path(
         "auth/token/logout/", CustomTokenDestroyView.as_view(), name="logout"
     ),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("", include("djoser.urls")),
 ]
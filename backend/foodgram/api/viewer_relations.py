@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from food.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Follow, User
+
+
+class ViewerRelations:
+    """
+    Связи текущего пользователя с объектами страницы:
+    избранные рецепты, рецепты в корзине и авторы, на которых он подписан.
+
+    Загружается один раз на запрос и передаётся сериализаторам
+    через контекст под ключом ``CONTEXT_KEY``.
+    """
+
+    CONTEXT_KEY = "viewer_relations"
+
+    def __init__(
+        self,
+        favorite_ids: Iterable[int] = (),
+        cart_ids: Iterable[int] = (),
+        following_ids: Iterable[int] = (),
+    ):
+        self.favorite_ids = frozenset(favorite_ids)
+        self.cart_ids = frozenset(cart_ids)
+        self.following_ids = frozenset(following_ids)
+
+    def is_favorited(self, recipe_id: int) -> bool:
+        return recipe_id in self.favorite_ids
+
+    def is_in_shopping_cart(self, recipe_id: int) -> bool:
+        return recipe_id in self.cart_ids
+
+    def is_subscribed(self, author_id: int) -> bool:
+        return author_id in self.following_ids
+
+    @classmethod
+    def for_recipes(
+        cls, user: User, recipes: Iterable[Recipe]
+    ) -> ViewerRelations:
+        """
+        Загружает связи пользователя с рецептами страницы и их авторами:
+        по одному запросу на избранное, корзину и подписки.
+        """
+        return cls(
+            **{
+                name: list(values)
+                for name, values in cls._recipe_relations(
+                    user, recipes
+                ).items()
+            }
+        )
+
+    @classmethod
+    async def afor_recipes(
+        cls, user: User, recipes: Iterable[Recipe]
+    ) -> ViewerRelations:
+        """То же, что for_recipes, через асинхронный ORM."""
+        relations = {}
+        for name, values in cls._recipe_relations(user, recipes).items():
+            relations[name] = [value async for value in values]
+        return cls(**relations)
+
+    @staticmethod
+    def _recipe_relations(user: User, recipes: Iterable[Recipe]) -> dict:
+        """Запросы идентификаторов для for_recipes и afor_recipes."""
+        if user.is_anonymous:
+            return {}
+        recipes = list(recipes)
+        recipe_ids = {recipe.pk for recipe in recipes}
+        author_ids = {recipe.author_id for recipe in recipes}
+        if not recipe_ids:
+            return {}
+        return {
+            "favorite_ids": FavoriteRecipe.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True),
+            "cart_ids": ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True),
+            "following_ids": Follow.objects.filter(
+                user=user, author_id__in=author_ids
+            ).values_list("author_id", flat=True),
+        }
+
+    @classmethod
+    def for_subscriptions(
+        cls, user: User, authors: Iterable[User]
+    ) -> ViewerRelations:
+        """
+        Связи для списка подписок пользователя: на всех авторов такого
+        списка он подписан по определению, поэтому запрос не нужен.
+        """
+        return cls(following_ids=[author.pk for author in authors])
+
+    @classmethod
+    async def afor_subscriptions(
+        cls, user: User, authors: Iterable[User]
+    ) -> ViewerRelations:
+        return cls.for_subscriptions(user, authors)
+
+
+class ViewerRelationsMixin:
+    """
+    Миксин для ViewSet: для действий из ``viewer_relations_actions``
+    добавляет в контекст сериализатора связи текущего пользователя
+    с сериализуемыми объектами. Асинхронные представления загружают их
+    через ``viewer_relations_aloader`` в aget_serializer.
+    """
+
+    viewer_relations_actions: tuple[str, ...] = ()
+    viewer_relations_loader = ViewerRelations.for_recipes
+    viewer_relations_aloader = ViewerRelations.afor_recipes
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.action in self.viewer_relations_actions:
+            kwargs["context"] = self.viewer_relations_context(
+                kwargs,
+                self.viewer_relations_loader(
+                    self.request.user, self.viewer_objects(args, kwargs)
+                ),
+            )
+        return super().get_serializer(*args, **kwargs)
+
+    async def aget_serializer(self, *args, **kwargs):
+        if args and self.action in self.viewer_relations_actions:
+            kwargs["context"] = self.viewer_relations_context(
+                kwargs,
+                await self.viewer_relations_aloader(
+                    self.request.user, self.viewer_objects(args, kwargs)
+                ),
+            )
+        return super().get_serializer(*args, **kwargs)
+
+    def viewer_objects(self, args, kwargs) -> list:
+        return args[0] if kwargs.get("many") else [args[0]]
+
+    def viewer_relations_context(self, kwargs, relations) -> dict:
+        context = kwargs.pop("context", None) or {}
+        context.update(self.get_serializer_context())
+        context[ViewerRelations.CONTEXT_KEY] = relations
+        return context
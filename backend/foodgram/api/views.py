@@ -1,3 +1,4 @@
+import os
 from urllib.parse import unquote
 
 from django_filters.rest_framework import DjangoFilterBackend
@@ -5,24 +6,34 @@ from djoser import utils
 from djoser.views import TokenDestroyView
 from rest_framework import filters, status
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_400_BAD_REQUEST,
     HTTP_405_METHOD_NOT_ALLOWED,
 )
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from django.db import IntegrityError
-from django.db.models import Count
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 
+from api.async_views import AsyncReadMixin
+from api.authentication import token_cache
+from api.catalog_cache import CatalogCacheMixin
 from api.mixin import MultiSerializerViewSetMixin
-from api.relation_handler_for_views import (
-    RelationHandler,
-    create_shopping_cart,
+from api.paginator import KeysetPageNumberPaginator
+from api.recipe_import import DEFAULT_CHUNK_SIZE, RecipeImporter
+from api.relation_handler_for_views import RelationHandler
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from api.response_cache import (
+    AnonymousResponseCacheMixin,
+    recipe_response_cache,
 )
 from api.serializers import (
     FavoriteRecipe,
@@ -33,8 +44,22 @@ from api.serializers import (
     SubscriptionSerializer,
     TagsSerializer,
 )
+from api.shopping_list_export import ShoppingListExport
+from api.viewer_relations import ViewerRelations, ViewerRelationsMixin
+from core.metrics import PrometheusWriter, route_metrics
+from food import shopping_list
+from food.custom_fields import Base64ImageField
 from food.filters import RecipeFilter
-from food.models import Ingredient, Recipe, ShoppingCart, Tag
+from food.images import get_executor
+from food.ingredient_index import ingredient_index
+from food.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from foodgram.db_pool.pool import pool_stats
 from users.models import Follow, User
 
 from .permissions import AdminOrReadOnly, AuthorOrStaffOrReadOnly
@@ -43,6 +68,39 @@ from .permissions import AdminOrReadOnly, AuthorOrStaffOrReadOnly
 ERROR_SUBSCRIBE_SELF = "Нельзя подписаться на себя"
 ERROR_ALREADY_SUBSCRIBED = "Вы уже подписаны на данного автора"
 ERROR_NOT_SUBSCRIBED = "Вы не подписаны на данного автора"
+ERROR_INVALID_LIMIT = "Ожидается целое положительное число."
+
+# Показатели пула соединений для /api/metrics/ (см. pool_stats).
+POOL_METRICS = (
+    ("size", "gauge"),
+    ("in_use", "gauge"),
+    ("idle", "gauge"),
+    ("waiting", "gauge"),
+    ("utilization", "gauge"),
+    ("acquired", "counter"),
+    ("waited", "counter"),
+    ("wait_seconds", "counter"),
+    ("timeouts", "counter"),
+    ("opened", "counter"),
+    ("closed", "counter"),
+)
+
+
+def get_positive_int(request, name, default=None):
+    """
+    Возвращает целый положительный параметр запроса или default,
+    если параметр не передан.
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise ValidationError({name: ERROR_INVALID_LIMIT})
+    return value
 
 
 @api_view(["POST", "DELETE"])
@@ -71,10 +129,19 @@ def follow_author(request, pk):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        follows = User.objects.filter(username=author)
+        follows = User.objects.filter(pk=author.pk)
 
         serializer = SubscriptionSerializer(
-            follows, context={"request": request}, many=True
+            follows,
+            context={
+                "request": request,
+                "recipes_limit": get_positive_int(
+                    request,
+                    "recipes_limit",
+                    SubscriptionSerializer.RECIPES_LIMIT,
+                ),
+            },
+            many=True,
         )
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -96,20 +163,61 @@ def follow_author(request, pk):
         )
 
 
-class SubscriptionListView(ReadOnlyModelViewSet):
+class SubscriptionListView(
+    ViewerRelationsMixin, AsyncReadMixin, ReadOnlyModelViewSet
+):
     """
     ViewSet для генерации списка подписок пользователя.
     """
 
-    queryset = User.objects.annotate(recipes_count=Count("recipes")).all()
+    viewer_relations_actions = ("list", "retrieve")
+    viewer_relations_loader = ViewerRelations.for_subscriptions
+    viewer_relations_aloader = ViewerRelations.afor_subscriptions
+    queryset = User.objects.all()
     serializer_class = SubscriptionSerializer
+    pagination_class = KeysetPageNumberPaginator
+    keyset_ordering = ("-follow_id",)
 
     permission_class = (IsAuthenticated,)
 
+    def get_recipes_limit(self):
+        return get_positive_int(
+            self.request, "recipes_limit", self.serializer_class.RECIPES_LIMIT
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["recipes_limit"] = self.get_recipes_limit()
+        return context
+
     def get_queryset(self):
+        """
+        Последние recipes_limit рецептов всех авторов страницы
+        загружаются одним запросом с ROW_NUMBER() по автору.
+        """
         user = self.request.user
-        new_queryset = User.objects.filter(following__user=user).annotate(
-            recipes_count=Count("recipes")
+        latest_recipes = (
+            Recipe.objects.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("author"),
+                    order_by=(F("pub_date").desc(), F("id").desc()),
+                )
+            )
+            .filter(row_number__lte=self.get_recipes_limit())
+            .order_by("-pub_date", "-id")
+        )
+        new_queryset = (
+            User.objects.filter(following__user=user)
+            .annotate(follow_id=F("following__id"))
+            .prefetch_related(
+                Prefetch(
+                    "recipes",
+                    queryset=latest_recipes,
+                    to_attr="latest_recipes",
+                )
+            )
+            .order_by(*self.keyset_ordering)
         )
         return new_queryset
 
@@ -125,23 +233,34 @@ class CustomTokenDestroyView(TokenDestroyView):
 
 
 class RecipeViewSet(
-    ModelViewSet, RelationHandler, MultiSerializerViewSetMixin
+    AnonymousResponseCacheMixin,
+    ViewerRelationsMixin,
+    AsyncReadMixin,
+    ModelViewSet,
+    RelationHandler,
+    MultiSerializerViewSetMixin,
 ):
     """
     ViewSet для модели Recipe.
     Поддерживает операции CRUD:
     (create, retrieve, update, delete) и список рецептов.
-
+    Список и рецепт для анонимных пользователей отдаются из кэша.
     """
 
+    viewer_relations_actions = ("list", "retrieve")
     queryset = Recipe.objects.select_related("author").prefetch_related(
-        "tags", "ingredients"
+        "tags",
+        Prefetch(
+            "ingredient",
+            queryset=RecipeIngredient.objects.select_related("ingredient"),
+        ),
     )
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     permission_class = (AuthorOrStaffOrReadOnly,)
     add_serializer = ShortRecipeSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPageNumberPaginator
+    keyset_ordering = ("-pub_date", "-id")
     serializer_classes = {
         "list": RecipeListSerializer,
         "retrieve": RecipeSerializer,
@@ -156,6 +275,20 @@ class RecipeViewSet(
         """
         return self.serializer_classes.get(self.action, RecipeSerializer)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        shopping_list.recipe_deleted(instance.pk)
+        instance.delete()
+
+    def get_serializer_context(self):
+        """
+        На странице рецепта отдаёт изображение в полном размере.
+        """
+        context = super().get_serializer_context()
+        if self.action == "retrieve":
+            context[Base64ImageField.VARIANT_CONTEXT_KEY] = "full"
+        return context
+
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request, pk):
         """
@@ -199,50 +332,175 @@ class RecipeViewSet(
         return self._delete_relation(ShoppingCart, request.user, pk)
 
     @action(
-        methods=("get",), detail=False, permission_classes=(IsAuthenticated,)
+        methods=("post", "delete"),
+        detail=False,
+        url_path="favorite/bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        """
+        Добавляет в избранное (POST) или удаляет из него (DELETE)
+        рецепты из списка {"recipes": [id, ...]}.
+        """
+        if request.method == "DELETE":
+            return self._bulk_delete_relations(
+                FavoriteRecipe, request.data, request.user
+            )
+        return self._bulk_create_relations(
+            FavoriteRecipe, request.data, request.user
+        )
+
+    @action(
+        methods=("post", "delete"),
+        detail=False,
+        url_path="shopping_cart/bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        """
+        Добавляет в корзину (POST) или удаляет из неё (DELETE)
+        рецепты из списка {"recipes": [id, ...]}.
+        """
+        if request.method == "DELETE":
+            return self._bulk_delete_relations(
+                ShoppingCart, request.data, request.user
+            )
+        return self._bulk_create_relations(
+            ShoppingCart, request.data, request.user
+        )
+
+    @action(
+        methods=("delete",),
+        detail=False,
+        url_path="shopping_cart",
+        permission_classes=(IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        """
+        Очищает корзину покупок текущего пользователя.
+        """
+        return self._clear_relations(ShoppingCart, request.user)
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="import",
+        permission_classes=(IsAdminUser,),
+    )
+    def import_recipes(self, request):
+        """
+        Импортирует рецепты из тела запроса в формате NDJSON
+        (см. api.recipe_import). Параметры: author - id автора рецептов
+        (по умолчанию текущий пользователь), chunk_size - размер порции.
+        """
+        author_id = get_positive_int(request, "author")
+        author = (
+            get_object_or_404(User, pk=author_id)
+            if author_id
+            else request.user
+        )
+        executor = None
+        if settings.IMAGE_PROCESSING_WORKERS:
+            executor = get_executor()
+        importer = RecipeImporter(
+            author,
+            chunk_size=get_positive_int(
+                request, "chunk_size", DEFAULT_CHUNK_SIZE
+            ),
+            executor=executor,
+        )
+        return Response(importer.run(request.stream or ()))
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, PDFRenderer),
     )
     def download_shopping_cart(self, request):
         """
-        Выгружает список рецептов из корзины
-        покупок текущего пользователя в текстовый файл.
+        Выгружает список покупок текущего пользователя в файл:
+        ?format=txt (по умолчанию), csv или pdf.
         """
         user = request.user
-        if not user.shopping_user.exists():
+        export = ShoppingListExport(user, request.accepted_renderer.format)
+        key = export.content_key()
+        if key is None:
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        filename = f"{user.username}_shopping_cart.txt"
-        shopping_cart = create_shopping_cart(user)
-        response = HttpResponse(
-            shopping_cart, content_type="text/plain; charset=UTF-8"
-        )
-        response["Content-Disposition"] = f"attachment; filename={filename}"
-        return response
+        return export.response(key, f"{user.username}_shopping_cart")
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(CatalogCacheMixin, AsyncReadMixin, ReadOnlyModelViewSet):
     """
     ViewSet для модели Tags.
     Поддерживает только операции чтения списка тегов и деталей отдельного тега.
+    Ответы кэшируются и отдаются с ETag; аутентификация не нужна,
+    поэтому повторный запрос не обращается к базе даже за токеном.
     """
 
+    authentication_classes = ()
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    CatalogCacheMixin, AsyncReadMixin, ReadOnlyModelViewSet
+):
     """
     ViewSet для модели Ingredient.
     Поддерживает только операции чтения
     списка ингредиентов и деталей отдельного ингредиента.
+    Ответы кэшируются так же, как у TagsViewSet.
     """
 
+    authentication_classes = ()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ("name",)
     pagination_class = None
 
+    TRUE_VALUES = ("1", "true")
+
+    def list(self, request, *args, **kwargs):
+        if "search" in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.catalog_response(
+            self.search_index, request, *args, **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        if "search" in request.query_params:
+            return await super().alist(request, *args, **kwargs)
+        return await self.acatalog_response(
+            self.asearch_index, request, *args, **kwargs
+        )
+
+    async def asearch_index(self, request, *args, **kwargs):
+        """Индекс в памяти не обращается к базе, ожидать нечего."""
+        return self.search_index(request, *args, **kwargs)
+
+    def search_index(self, request, *args, **kwargs):
+        """
+        Возвращает ингредиенты для автодополнения из общего индекса
+        в памяти, не обращаясь к базе данных.
+        Параметры: name - начало названия, limit - наибольшее число
+        результатов, ranked=1 - дополнить выдачу совпадениями по подстроке.
+        """
+        name = unquote(request.query_params.get("name", ""))
+        ranked = (
+            request.query_params.get("ranked", "").lower() in self.TRUE_VALUES
+        )
+        return Response(
+            ingredient_index.search(
+                name, limit=self.get_limit(request), ranked=ranked
+            )
+        )
+
+    def get_limit(self, request):
+        return get_positive_int(request, "limit")
+
     def get_queryset(self):
         name = self.request.query_params.get("name", None)
         if name is not None:
@@ -251,3 +509,46 @@ class IngredientViewSet(ReadOnlyModelViewSet):
         if name:
             queryset = queryset.filter(name__istartswith=name)
         return queryset
+
+
+class MetricsView(APIView):
+    """
+    Метрики в текстовом формате Prometheus, только для персонала.
+    Метрики маршрутов собираются со всех процессов (см. core.metrics),
+    пул соединений и кэши - только процесса, ответившего на запрос
+    (метка pid).
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        writer = PrometheusWriter()
+        route_metrics.write(writer)
+        process = {"pid": os.getpid()}
+        pools = pool_stats()
+        for key, kind in POOL_METRICS:
+            writer.add(
+                f"foodgram_db_pool_{key}"
+                + ("_total" if kind == "counter" else ""),
+                kind,
+                f"Пул соединений: {key}.",
+                (
+                    ("", {**process, "alias": alias}, stats[key])
+                    for alias, stats in pools.items()
+                ),
+            )
+        caches = {
+            "response_cache": recipe_response_cache.stats(),
+            "auth_token_cache": token_cache.stats(),
+        }
+        for name, stats in caches.items():
+            for key, value in stats.items():
+                writer.add(
+                    f"foodgram_{name}_{key}_total",
+                    "counter",
+                    f"Кэш {name}: {key}.",
+                    (("", process, value),),
+                )
+        return HttpResponse(
+            writer.render(), content_type=PrometheusWriter.content_type
+        )
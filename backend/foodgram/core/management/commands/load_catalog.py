@@ -0,0 +1,171 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Trim
+
+from food.generations import catalog_generation, recipe_generation
+from food.ingredient_index import build_index
+from food.models import Ingredient, Tag
+
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+# Модель, уникальные поля для поиска существующей записи
+# и поля, обновляемые у найденной записи. Теги ищутся по каждому
+# уникальному полю отдельно, см. Command.upsert.
+CATALOGS = {
+    "ingredients": (Ingredient, ("name", "measurement_unit"), ()),
+    "tags": (Tag, ("slug", "name"), ("color",)),
+}
+
+
+def read_rows(path: Path):
+    """
+    Построчно читает записи из CSV, JSON-массива или NDJSON
+    и возвращает пары (номер строки или записи, словарь значений).
+    """
+    suffix = path.suffix.lower()
+    with open(path, encoding="utf-8", newline="") as file:
+        if suffix == ".csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        elif suffix == ".json":
+            yield from enumerate(json.load(file), start=1)
+        elif suffix in (".ndjson", ".jsonl"):
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+        else:
+            raise CommandError(f"{path}: неподдерживаемый формат файла.")
+
+
+class Command(BaseCommand):
+    """
+    Команда для загрузки справочников ингредиентов и тегов.
+
+    Повторный запуск не создаёт дубликатов: новые ингредиенты добавляются,
+    существующие пропускаются, у тегов с тем же слагом или названием
+    обновляются остальные поля. Оба справочника загружаются в одной
+    транзакции.
+    """
+
+    help = "Загружает ингредиенты и теги из CSV, JSON или NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingredients",
+            type=Path,
+            default=DATA_DIR / "ingredients.csv",
+            help="Файл ингредиентов с полями name, measurement_unit.",
+        )
+        parser.add_argument(
+            "--tags",
+            type=Path,
+            default=DATA_DIR / "tags.csv",
+            help="Файл тегов с полями name, color, slug.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество записей в одном INSERT.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for catalog in CATALOGS:
+                self.load(catalog, options[catalog], options["batch_size"])
+        build_index()
+        catalog_generation.bump()
+        recipe_generation.bump()
+
+    def load(self, catalog: str, path: Path, batch_size: int):
+        model, unique_fields, update_fields = CATALOGS[catalog]
+        fields = unique_fields + update_fields
+        started = time.perf_counter()
+        rows = (
+            self.clean(path, number, row, fields)
+            for number, row in read_rows(path)
+        )
+        total = 0
+        before = model.objects.count()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            total += len(batch)
+            if update_fields:
+                try:
+                    self.upsert(model, batch, unique_fields, fields)
+                except IntegrityError as error:
+                    raise CommandError(f"{path}: {error}")
+                continue
+            # В одном INSERT ... ON CONFLICT ключ не может повторяться.
+            objects = {
+                tuple(row[field] for field in unique_fields): model(**row)
+                for row in batch
+            }
+            model.objects.bulk_create(objects.values(), ignore_conflicts=True)
+        created = model.objects.count() - before
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{path.name}: прочитано {total}, добавлено {created}, "
+            f"{total / elapsed if elapsed else 0:.0f} строк/с."
+        )
+
+    @staticmethod
+    def upsert(model, batch: list, unique_fields: tuple, fields: tuple):
+        """
+        Обновляет записи, совпавшие с новыми по любому из уникальных
+        полей, и добавляет остальные. Значения сравниваются без пробелов
+        по краям: их оставлял прежний загрузчик справочников.
+        """
+        condition = Q()
+        for field in unique_fields:
+            condition |= Q(
+                **{f"trimmed_{field}__in": [row[field] for row in batch]}
+            )
+        existing = {}
+        for obj in model.objects.annotate(
+            **{f"trimmed_{field}": Trim(field) for field in unique_fields}
+        ).filter(condition):
+            for field in unique_fields:
+                existing[field, getattr(obj, f"trimmed_{field}")] = obj.pk
+        to_update = {}
+        to_create = {}
+        for row in batch:
+            pk = next(
+                (
+                    existing[field, row[field]]
+                    for field in unique_fields
+                    if (field, row[field]) in existing
+                ),
+                None,
+            )
+            if pk is None:
+                to_create[row[unique_fields[0]]] = model(**row)
+            else:
+                to_update[pk] = model(pk=pk, **row)
+        model.objects.bulk_update(to_update.values(), fields)
+        model.objects.bulk_create(to_create.values())
+
+    def clean(self, path: Path, number: int, row, fields) -> dict:
+        if not isinstance(row, dict):
+            raise CommandError(f"{path}:{number}: ожидается объект.")
+        values = {}
+        for field in fields:
+            value = row.get(field)
+            value = value.strip() if isinstance(value, str) else ""
+            if not value:
+                raise CommandError(
+                    f"{path}:{number}: не заполнено поле {field}."
+                )
+            values[field] = value
+        return values
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Выполняется в отдельном интерпретаторе с -X importtime: загружает
+# WSGI-приложение, обслуживает один запрос и печатает отметки времени.
+CHILD = """
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", sys.argv[3])
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.time()
+environ = {"PATH_INFO": sys.argv[1], "HTTP_HOST": sys.argv[2]}
+setup_testing_defaults(environ)
+status = []
+def start_response(line, headers, exc_info=None):
+    status.append(line)
+body = application(environ, start_response)
+for _ in body:
+    pass
+body.close()
+print(json.dumps({"ready": ready, "served": time.time(), "status": status[0]}))
+"""
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_import_times(output: str) -> list:
+    """
+    Разбирает вывод -X importtime в список
+    (модуль, собственное время, суммарное время, вложенность), мкс.
+    """
+    rows = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, total, indent, module = match.groups()
+            rows.append((module, int(own), int(total), len(indent) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    """
+    Команда для измерения холодного старта: времени импорта модулей
+    и времени от запуска процесса до первого обслуженного запроса.
+    """
+
+    help = (
+        "Показывает время импорта по пакетам и модулям и время до первого "
+        "ответа. С --budget завершается с ошибкой при превышении."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default="/api/tags/",
+            help="Путь первого запроса.",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Количество запусков, сравнивается медиана.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Количество строк в таблице импортов.",
+        )
+        parser.add_argument(
+            "--modules",
+            action="store_true",
+            help="Показывать отдельные модули вместо пакетов верхнего уровня.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=int,
+            default=settings.STARTUP_TIME_BUDGET_MS,
+            help="Допустимое время до первого ответа, мс (0 - без проверки).",
+        )
+
+    def handle(self, *args, **options):
+        results = [
+            self.measure(options["path"]) for _ in range(options["runs"])
+        ]
+        imports = results[-1]["imports"]
+        if options["modules"]:
+            self.write_modules(imports, options["limit"])
+        else:
+            self.write_packages(imports, options["limit"])
+
+        setup_ms = statistics.median(result["setup"] for result in results)
+        first_ms = statistics.median(result["first"] for result in results)
+        self.stdout.write(
+            f"Импорт: {sum(row[1] for row in imports) / 1000:.0f} мс, "
+            f"модулей: {len(imports)}."
+        )
+        self.stdout.write(f"Готовность приложения: {setup_ms:.0f} мс.")
+        self.stdout.write(
+            f"Первый ответ {options['path']} "
+            f"({results[-1]['status']}): {first_ms:.0f} мс."
+        )
+
+        budget = options["budget"]
+        if budget and first_ms > budget:
+            raise CommandError(
+                f"Время до первого ответа {first_ms:.0f} мс "
+                f"превышает бюджет {budget} мс."
+            )
+        if budget:
+            self.stdout.write(
+                self.style.SUCCESS(f"В пределах бюджета {budget} мс.")
+            )
+
+    def measure(self, path: str) -> dict:
+        host = self.host()
+        started = time.time()
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                CHILD,
+                path,
+                host,
+                os.environ["DJANGO_SETTINGS_MODULE"],
+            ],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            # Хост запроса разрешён и без DEBUG, и без ALLOWED_HOSTS.
+            env={**os.environ, "ALLOWED_HOSTS": host},
+        )
+        if process.returncode:
+            raise CommandError(
+                "Процесс завершился с ошибкой:\n" + process.stderr[-2000:]
+            )
+        marks = json.loads(process.stdout.strip().splitlines()[-1])
+        return {
+            "imports": parse_import_times(process.stderr),
+            "setup": (marks["ready"] - started) * 1000,
+            "first": (marks["served"] - started) * 1000,
+            "status": marks["status"],
+        }
+
+    def host(self) -> str:
+        for host in settings.ALLOWED_HOSTS:
+            if host != "*" and not host.startswith("."):
+                return host
+        return "localhost"
+
+    def write_packages(self, imports: list, limit: int):
+        packages = defaultdict(int)
+        for module, own, _, _ in imports:
+            packages[module.split(".")[0]] += own
+        self.stdout.write(f"{'мс':>8}  пакет")
+        for package, own in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:limit]:
+            self.stdout.write(f"{own / 1000:8.1f}  {package}")
+
+    def write_modules(self, imports: list, limit: int):
+        self.stdout.write(f"{'своё, мс':>9} {'всего, мс':>10}  модуль")
+        for module, own, total, depth in sorted(
+            imports, key=lambda row: row[2], reverse=True
+        )[:limit]:
+            self.stdout.write(
+                f"{own / 1000:9.1f} {total / 1000:10.1f}  "
+                f"{'  ' * depth}{module}"
+            )
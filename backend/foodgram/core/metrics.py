@@ -0,0 +1,318 @@
+"""
+Метрики HTTP-запросов по маршрутам: гистограммы времени ответа
+и размера ответа, количество ответов по классам статусов.
+
+На каждый маршрут хранится вектор из WIDTH чисел, поэтому память
+не растёт с числом запросов. Без METRICS_DIR вектора лежат в памяти
+процесса. С METRICS_DIR каждый процесс пишет их в свой файл
+<pid>.metrics, отображённый в память (mmap), а collect() суммирует
+файлы всех процессов. Файлы завершившихся воркеров остаются, и их
+счётчики продолжают входить в сумму; каталог очищается при старте
+(см. docker-entrypoint.sh).
+"""
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+# Расположение значений в векторе маршрута: счётчики корзин (последняя -
+# +Inf) и сумма для времени и для размера, затем счётчики статусов.
+LATENCY = 0
+LATENCY_SUM = LATENCY + len(LATENCY_BUCKETS) + 1
+SIZE = LATENCY_SUM + 1
+SIZE_SUM = SIZE + len(SIZE_BUCKETS) + 1
+STATUS = SIZE_SUM + 1
+WIDTH = STATUS + len(STATUS_CLASSES)
+
+UNMATCHED_ROUTE = "unmatched"
+
+HEADER = struct.Struct("<Q")
+KEY_LENGTH = struct.Struct("<I")
+VALUE = struct.Struct("<d")
+INITIAL_SIZE = 64 * 1024
+
+
+def entry_key_size(length: int) -> int:
+    """Длина ключа записи с выравниванием значений на 8 байт."""
+    size = KEY_LENGTH.size + length
+    return size + -size % 8
+
+
+def read_entries(buffer, width: int):
+    """
+    Перебирает записи буфера: (ключ, смещение первого значения).
+
+    Формат буфера: заголовок с занятым размером, затем записи
+    [длина ключа][ключ][width значений double]. Заголовок обновляется
+    после записи ключа, поэтому читатель не видит недописанных записей.
+    """
+    used = HEADER.unpack_from(buffer, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(buffer, position)[0]
+        start = position + KEY_LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        position += entry_key_size(length)
+        yield key, position
+        position += width * VALUE.size
+
+
+def read_values(buffer, offset: int, width: int) -> list:
+    return list(struct.unpack_from(f"<{width}d", buffer, offset))
+
+
+class MetricsBuffer:
+    """
+    Вектора чисел по ключам в bytearray или в файле, отображённом
+    в память. Существующий файл (например, от воркера с тем же pid)
+    продолжается, а не перезаписывается.
+    """
+
+    def __init__(self, width: int, path: Optional[Path] = None):
+        self.width = width
+        self.path = path
+        self._fd = None
+        if path is None:
+            self._buffer = bytearray(INITIAL_SIZE)
+            HEADER.pack_into(self._buffer, 0, HEADER.size)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            size = os.fstat(self._fd).st_size
+            if size < INITIAL_SIZE:
+                os.ftruncate(self._fd, INITIAL_SIZE)
+            self._buffer = mmap.mmap(self._fd, max(size, INITIAL_SIZE))
+            if not size:
+                HEADER.pack_into(self._buffer, 0, HEADER.size)
+        self._offsets = dict(read_entries(self._buffer, width))
+
+    def offset(self, key: str) -> int:
+        """Смещение значений ключа; новый ключ добавляется с нулями."""
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._offsets[key] = self._append(key)
+        return offset
+
+    def add(self, offset: int, index: int, amount: float) -> None:
+        position = offset + index * VALUE.size
+        value = VALUE.unpack_from(self._buffer, position)[0]
+        VALUE.pack_into(self._buffer, position, value + amount)
+
+    def items(self):
+        for key, offset in self._offsets.items():
+            yield key, read_values(self._buffer, offset, self.width)
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode()
+        used = HEADER.unpack_from(self._buffer, 0)[0]
+        offset = used + entry_key_size(len(encoded))
+        end = offset + self.width * VALUE.size
+        if end > len(self._buffer):
+            self._grow(end)
+        KEY_LENGTH.pack_into(self._buffer, used, len(encoded))
+        start = used + KEY_LENGTH.size
+        self._buffer[start:start + len(encoded)] = encoded
+        HEADER.pack_into(self._buffer, 0, end)
+        return offset
+
+    def _grow(self, required: int) -> None:
+        size = len(self._buffer)
+        while size < required:
+            size *= 2
+        if self._fd is None:
+            self._buffer.extend(bytes(size - len(self._buffer)))
+            return
+        self._buffer.close()
+        os.ftruncate(self._fd, size)
+        self._buffer = mmap.mmap(self._fd, size)
+
+
+class RouteMetrics:
+    """Метрики запросов по именам маршрутов (api:recipes-list и т. п.)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._buffer = None
+
+    @property
+    def directory(self) -> Optional[Path]:
+        if not settings.METRICS_DIR:
+            return None
+        return Path(settings.METRICS_DIR)
+
+    def observe(
+        self,
+        route: str,
+        duration: float,
+        size: Optional[int],
+        status_code: int,
+    ) -> None:
+        status_class = min(max(status_code // 100, 1), 5) - 1
+        with self._lock:
+            buffer = self._current_buffer()
+            offset = buffer.offset(route)
+            buffer.add(
+                offset, LATENCY + bisect_left(LATENCY_BUCKETS, duration), 1
+            )
+            buffer.add(offset, LATENCY_SUM, duration)
+            if size is not None:
+                buffer.add(offset, SIZE + bisect_left(SIZE_BUCKETS, size), 1)
+                buffer.add(offset, SIZE_SUM, size)
+            buffer.add(offset, STATUS + status_class, 1)
+
+    def collect(self) -> dict:
+        """Значения по маршрутам, в режиме METRICS_DIR - всех процессов."""
+        directory = self.directory
+        if directory is None:
+            with self._lock:
+                buffer = self._current_buffer()
+                return dict(buffer.items())
+        totals = {}
+        for path in directory.glob("*.metrics"):
+            data = path.read_bytes()
+            if len(data) < HEADER.size:
+                continue
+            for route, offset in read_entries(data, WIDTH):
+                values = read_values(data, offset, WIDTH)
+                total = totals.setdefault(route, [0.0] * WIDTH)
+                for index, value in enumerate(values):
+                    total[index] += value
+        return totals
+
+    def write(self, writer: "PrometheusWriter") -> None:
+        routes = sorted(self.collect().items())
+        writer.histogram(
+            "foodgram_http_request_duration_seconds",
+            "Время обработки запроса, с.",
+            LATENCY_BUCKETS,
+            (
+                (
+                    {"route": route},
+                    values[LATENCY:LATENCY_SUM],
+                    values[LATENCY_SUM],
+                )
+                for route, values in routes
+            ),
+        )
+        writer.histogram(
+            "foodgram_http_response_size_bytes",
+            "Размер тела ответа, байт.",
+            SIZE_BUCKETS,
+            (
+                ({"route": route}, values[SIZE:SIZE_SUM], values[SIZE_SUM])
+                for route, values in routes
+            ),
+        )
+        writer.add(
+            "foodgram_http_responses_total",
+            "counter",
+            "Количество ответов по классам статусов.",
+            (
+                ("", {"route": route, "status": status}, values[index])
+                for route, values in routes
+                for index, status in enumerate(STATUS_CLASSES, STATUS)
+                if values[index]
+            ),
+        )
+
+    def _current_buffer(self) -> MetricsBuffer:
+        """Вызывается под блокировкой; после fork открывает свой буфер."""
+        pid = os.getpid()
+        if self._pid != pid:
+            directory = self.directory
+            path = None
+            if directory is not None:
+                directory.mkdir(parents=True, exist_ok=True)
+                path = directory / f"{pid}.metrics"
+            self._buffer = MetricsBuffer(WIDTH, path)
+            self._pid = pid
+        return self._buffer
+
+
+def format_value(value) -> str:
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class PrometheusWriter:
+    """Текстовый формат экспорта Prometheus 0.0.4."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, name: str, kind: str, description: str, samples) -> None:
+        """samples: (суффикс имени, метки, значение)."""
+        self.lines.append(f"# HELP {name} {description}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            self.lines.append(
+                f"{name}{suffix}{format_labels(labels)} "
+                f"{format_value(value)}"
+            )
+
+    def histogram(
+        self, name: str, description: str, bounds: tuple, series
+    ) -> None:
+        """
+        series: (метки, счётчики корзин с последней +Inf, сумма).
+        Счётчики корзин накапливаются, как требует формат.
+        """
+        samples = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(bounds + ("+Inf",), counts):
+                cumulative += count
+                samples.append(
+                    ("_bucket", {**labels, "le": bound}, cumulative)
+                )
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        self.add(name, "histogram", description, samples)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+route_metrics = RouteMetrics()
@@ -0,0 +1,258 @@
+"""
+Учёт SQL-запросов каждого HTTP-запроса без DEBUG.
+
+Обёртка record_query ставится в execute_wrappers каждого нового
+соединения с базой (сигнал connection_created, см. core.apps) и пишет
+запросы в журнал QueryLog текущего HTTP-запроса. Журнал хранится
+в ContextVar, поэтому запросы из потоков sync_to_async асинхронных
+представлений попадают в журнал своего HTTP-запроса.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+from core.metrics import UNMATCHED_ROUTE, route_metrics
+
+
+slow_request_logger = logging.getLogger("slow_requests")
+
+_query_log = ContextVar("query_log", default=None)
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Нормализует SQL: литералы и параметры заменяются на ?, списки IN
+    на (...). Запросы, отличающиеся только значениями, совпадают.
+    """
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryLog:
+    """Количество и время SQL-запросов одного HTTP-запроса."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # SQL -> [количество, суммарное время, максимальное время].
+        self.statements = {}
+
+    def add(self, sql: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        stat = self.statements.get(sql)
+        if stat is None:
+            self.statements[sql] = [1, duration, duration]
+        else:
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] = max(stat[2], duration)
+
+    def top(self, limit: int) -> list:
+        """
+        Самые затратные по суммарному времени запросы, сгруппированные
+        по нормализованному SQL.
+        """
+        groups = {}
+        for sql, (count, total, slowest) in self.statements.items():
+            text = fingerprint(sql)
+            group = groups.setdefault(text, [0, 0.0, 0.0])
+            group[0] += count
+            group[1] += total
+            group[2] = max(group[2], slowest)
+        rows = sorted(groups.items(), key=lambda item: item[1][1])
+        return [
+            {
+                "fingerprint": hashlib.sha1(text.encode()).hexdigest()[:12],
+                "sql": text[:1000],
+                "count": count,
+                "total_ms": round(total * 1000, 2),
+                "max_ms": round(slowest * 1000, 2),
+            }
+            for text, (count, total, slowest) in reversed(rows[-limit:])
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    query_log = _query_log.get()
+    if query_log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query_log.add(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def resolved_user(request):
+    """
+    Пользователь запроса, если он уже определён. Ленивый пользователь
+    из сессии не вычисляется, чтобы не делать лишний запрос к базе.
+    """
+    user = getattr(request, "user", None)
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    return user
+
+
+def view_name(request) -> str:
+    """
+    Имя представления: RecipeViewSet.list, follow_author.post и т. п.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return ""
+    view = getattr(match.func, "cls", None)
+    if view is None:
+        return match.view_name or match.func.__name__
+    actions = getattr(match.func, "actions", None) or {}
+    method = request.method.lower()
+    return f"{view.__name__}.{actions.get(method, method)}"
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Считает SQL-запросы и время базы данных каждого HTTP-запроса.
+
+    Персоналу (is_staff) отдаёт заголовки X-DB-Queries и X-DB-Time (мс).
+    Запросы, достигшие SLOW_REQUEST_QUERY_COUNT SQL-запросов или
+    SLOW_REQUEST_DB_TIME_MS мс базы (0 - без проверки), пишутся строкой
+    JSON в лог slow_requests с именем представления и самыми затратными
+    нормализованными SQL-запросами.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        query_log = QueryLog()
+        token = _query_log.set(query_log)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_log.reset(token)
+        self.report(request, response, query_log, started)
+        return response
+
+    async def __acall__(self, request):
+        query_log = QueryLog()
+        token = _query_log.set(query_log)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_log.reset(token)
+        self.report(request, response, query_log, started)
+        return response
+
+    def report(self, request, response, query_log, started):
+        duration = time.perf_counter() - started
+        db_time_ms = query_log.duration * 1000
+        user = resolved_user(request)
+        if getattr(user, "is_staff", False):
+            response["X-DB-Queries"] = str(query_log.count)
+            response["X-DB-Time"] = f"{db_time_ms:.1f}"
+        max_queries = settings.SLOW_REQUEST_QUERY_COUNT
+        max_db_time_ms = settings.SLOW_REQUEST_DB_TIME_MS
+        if not (
+            (max_queries and query_log.count >= max_queries)
+            or (max_db_time_ms and db_time_ms >= max_db_time_ms)
+        ):
+            return
+        slow_request_logger.warning(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.get_full_path(),
+                    "view": view_name(request),
+                    "status": response.status_code,
+                    "user_id": getattr(user, "pk", None),
+                    "duration_ms": round(duration * 1000, 2),
+                    "queries": query_log.count,
+                    "db_time_ms": round(db_time_ms, 2),
+                    "statements": query_log.top(
+                        settings.SLOW_REQUEST_TOP_QUERIES
+                    ),
+                },
+                ensure_ascii=False,
+            )
+        )
+
+
+def response_size(response):
+    """Размер тела ответа; для потоковых - из Content-Length, если есть."""
+    if not response.streaming:
+        return len(response.content)
+    length = response.get("Content-Length")
+    return int(length) if length else None
+
+
+class RequestMetricsMiddleware:
+    """
+    Записывает время обработки, размер и статус ответа в метрики
+    маршрута (core.metrics.route_metrics). Маршрут - имя URL
+    (api:recipes-list); запросы без маршрута считаются вместе.
+    Для потоковых ответов время учитывается до начала отдачи тела.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        match = getattr(request, "resolver_match", None)
+        route_metrics.observe(
+            (match and match.view_name) or UNMATCHED_ROUTE,
+            time.perf_counter() - started,
+            response_size(response),
+            response.status_code,
+        )
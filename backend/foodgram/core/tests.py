@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+
+# Хост первого запроса startup_profile; testserver, который добавляет
+# тестовый раннер, не используется.
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class StartupProfileTests(SimpleTestCase):
+    """
+    Вывод startup_profile и проверка бюджета. Само время старта
+    зависит от машины и проверяется командой make startup-check.
+    Первый запрос - корень API: он не обращается к базе, а тестовая
+    база дочернему процессу недоступна.
+    """
+
+    def profile(self, budget: int) -> str:
+        stdout = StringIO()
+        call_command(
+            "startup_profile",
+            path="/api/",
+            runs=1,
+            budget=budget,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_output(self):
+        output = self.profile(budget=0)
+        self.assertRegex(output, r"Импорт: \d+ мс, модулей: \d+\.")
+        self.assertRegex(output, r"Готовность приложения: \d+ мс\.")
+        self.assertRegex(output, r"Первый ответ /api/ \(200 OK\): \d+ мс\.")
+
+    def test_exceeded_budget_fails(self):
+        with self.assertRaisesMessage(CommandError, "превышает бюджет 1 мс"):
+            self.profile(budget=1)
@@ -1,8 +1,9 @@
 from admin_auto_filters.filters import AutocompleteFilter
 
 from django.contrib import admin
-from django.db.models import Count
+from django.db import transaction
 
+from . import shopping_list
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag,)
 
@@ -34,23 +35,12 @@ class IngredientAdmin(admin.ModelAdmin):
         "id",
         "name",
         "measurement_unit",
-        "get_recipes_count",
+        "usage_count",
     )
     search_fields = ("name",)
     ordering = ("measurement_unit",)
     list_display_links = ("id", "name")
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related("recipes")
-
-    def get_recipes_count(self, obj):
-        """
-        Возвращает количество рецептов, в которых используется ингредиент.
-        """
-        return RecipeIngredient.objects.filter(ingredient=obj.id).count()
-
-    get_recipes_count.short_description = "Использований в рецептах"
-
 
 class RecipeIngredientsInline(admin.TabularInline):
     """
@@ -73,6 +63,26 @@ class RecipeIngredientsAdmin(admin.ModelAdmin):
     list_display_links = ("id", "recipe")
     search_fields = ("recipe__name", "ingredient__name")
 
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial.get("recipe"))
+        recipe_ids.discard(None)
+        with shopping_list.tracking_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        with shopping_list.tracking_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        recipe_ids = queryset.values_list("recipe_id", flat=True)
+        with shopping_list.tracking_recipes(recipe_ids):
+            super().delete_queryset(request, queryset)
+
 
 class AuthorAutocompleteFilter(AutocompleteFilter):
     title = "Author"
@@ -91,7 +101,7 @@ class RecipeAdmin(admin.ModelAdmin):
     Административный класс для модели Recipe.
     """
 
-    list_display = ("id", "name", "author", "favorites")
+    list_display = ("id", "name", "author", "favorites_count")
     list_filter = (
         AuthorAutocompleteFilter,
         TagsAutocompleteFilter,
@@ -106,16 +116,22 @@ class RecipeAdmin(admin.ModelAdmin):
             .get_queryset(request)
             .select_related("author")
             .prefetch_related("tags")
-            .annotate(favorites_count=Count("favorites"))
         )
 
-    def favorites(self, obj):
-        """
-        Возвращает количество раз, когда рецепт был добавлен в избранное.
-        """
-        return obj.favorites_count
+    def save_related(self, request, form, formsets, change):
+        with shopping_list.tracking_recipes([form.instance.pk]):
+            super().save_related(request, form, formsets, change)
 
-    favorites.short_description = "Количество добавлений в избранное"
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        shopping_list.recipe_deleted(obj.pk)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for recipe_id in queryset.values_list("pk", flat=True):
+            shopping_list.recipe_deleted(recipe_id)
+        super().delete_queryset(request, queryset)
 
 
 @admin.register(FavoriteRecipe)
@@ -150,3 +166,22 @@ class ShoppingListAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("user", "recipe")
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change:
+            old = ShoppingCart.objects.get(pk=obj.pk)
+            shopping_list.remove_recipe(old.user_id, old.recipe_id)
+        super().save_model(request, obj, form, change)
+        shopping_list.add_recipe(obj.user_id, obj.recipe_id)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        shopping_list.remove_recipe(obj.user_id, obj.recipe_id)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for user_id, recipe_id in queryset.values_list("user_id", "recipe_id"):
+            shopping_list.remove_recipe(user_id, recipe_id)
+        super().delete_queryset(request, queryset)
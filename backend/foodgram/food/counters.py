@@ -0,0 +1,88 @@
+"""
+Хранимые счётчики связанных записей.
+
+Счётчики меняются выражениями F() в момент создания или удаления
+связанной записи (см. food.signals), поэтому параллельные запросы
+не затирают изменения друг друга. Расхождения, возникшие в обход
+сигналов (bulk_create, raw SQL), исправляет команда recount_counters.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+
+# (модель со счётчиком, поле счётчика, связанная модель, поле связи)
+COUNTERS = (
+    ("users.User", "recipes_count", "food.Recipe", "author"),
+    ("users.User", "followers_count", "users.Follow", "author"),
+    ("food.Recipe", "favorites_count", "food.FavoriteRecipe", "recipe"),
+    ("food.Recipe", "in_carts_count", "food.ShoppingCart", "recipe"),
+    ("food.Ingredient", "usage_count", "food.RecipeIngredient", "ingredient"),
+)
+
+_suppressed = ContextVar("counters_suppressed", default=False)
+
+
+def adjust(model, pks, field: str, delta: int) -> int:
+    """
+    Изменяет счётчик у записей с первичными ключами pks на delta
+    одним UPDATE; при уменьшении счётчик не опускается ниже нуля.
+    """
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, Value(0))
+    return model.objects.filter(pk__in=pks).update(**{field: value})
+
+
+@contextmanager
+def suppressed():
+    """
+    Отключает изменение счётчиков сигналами (food.signals) внутри блока:
+    при массовом удалении через QuerySet.delete() вызывающий код
+    меняет счётчики сам одним adjust по списку удаляемых записей.
+    """
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def is_suppressed() -> bool:
+    return _suppressed.get()
+
+
+def recount(apps, label, field, related_label, related_field, chunk_size):
+    """
+    Пересчитывает счётчик порциями по chunk_size записей и сохраняет
+    только разошедшиеся значения. Возвращает количество исправленных.
+    """
+    model = apps.get_model(label)
+    related = apps.get_model(related_label)
+    repaired = 0
+    last_pk = None
+    while True:
+        rows = model.objects.order_by("pk")
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        rows = list(rows.values_list("pk", field)[:chunk_size])
+        if not rows:
+            return repaired
+        last_pk = rows[-1][0]
+        actual = dict(
+            related.objects.filter(
+                **{f"{related_field}__in": [pk for pk, _ in rows]}
+            )
+            .order_by()
+            .values_list(related_field)
+            .annotate(total=Count("pk"))
+        )
+        drifted = [
+            model(pk=pk, **{field: actual.get(pk, 0)})
+            for pk, stored in rows
+            if stored != actual.get(pk, 0)
+        ]
+        model.objects.bulk_update(drifted, (field,))
+        repaired += len(drifted)
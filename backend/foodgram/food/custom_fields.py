@@ -1,11 +1,18 @@
 import base64
+import mimetypes
+from urllib.parse import urlsplit
 
 from rest_framework import serializers
+from rest_framework.fields import SkipField
 
+from django.conf import settings
 from django.core import validators
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.db import models
 
+from .images import DERIVATIVE_FORMATS, DERIVATIVE_SPECS
+from .uploads import ImageTooLarge, decode_data_uri, image_pixels
+
 
 class Hex2NameColor(models.CharField):
     """
@@ -26,28 +33,179 @@ class Hex2NameColor(models.CharField):
         )
 
 
-class Base64ImageField(serializers.Field):
+class Base64ImageField(serializers.ImageField):
     """
-    Преобразует base64-строку в файловый объект при десериализации.
-    Преобразует файловый объект в base64-строку при сериализации.
+    Принимает изображение в виде base64-строки (data URI) или файла
+    из multipart/form-data. Base64 декодируется порциями во временный файл,
+    размер и количество пикселей ограничены настройками
+    IMAGE_UPLOAD_MAX_BYTES и IMAGE_UPLOAD_MAX_PIXELS.
+
+    При сериализации возвращает путь к файлу внутри MEDIA_URL, который
+    nginx отдаёт напрямую с долгим кэшированием. Старые клиенты могут
+    запросить изображение в base64 параметром ``?inline_images=1``.
+
+    Если для изображения построены производные (food.images), отдаётся
+    наименьшая из них, которая не уже размера ``variant``. Размер можно
+    переопределить для запроса ключом контекста ``VARIANT_CONTEXT_KEY``.
     """
 
+    default_error_messages = {
+        "invalid_base64": "Неверный формат изображения.",
+        "too_large": (
+            "Размер изображения не должен превышать {max_bytes} байт."
+        ),
+        "too_many_pixels": (
+            "Изображение не должно содержать больше {max_pixels} пикселей."
+        ),
+        "not_current_url": (
+            "Ссылкой можно указать только текущее изображение, новое "
+            "передаётся в base64."
+        ),
+    }
+    INLINE_QUERY_PARAM = "inline_images"
+    INLINE_TRUE_VALUES = ("1", "true")
+    VARIANT_CONTEXT_KEY = "image_variant"
+    DERIVATIVE_FORMAT = "webp"
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         """
         Преобразует base64-строку в файловый объект.
+        При изменении объекта ссылка на его текущее изображение (в том
+        числе на производную) пропускается, другие ссылки отклоняются.
+        Файлы из multipart/form-data принимаются без перекодирования.
+        """
+        if isinstance(data, str) and (
+            data.startswith("http") or data.startswith(settings.MEDIA_URL)
+        ):
+            if urlsplit(data).path in self.current_paths():
+                raise SkipField()
+            self.fail("not_current_url")
+        if isinstance(data, str):
+            try:
+                data = decode_data_uri(data)
+            except ImageTooLarge:
+                self.fail(
+                    "too_large", max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES
+                )
+            except ValueError:
+                self.fail("invalid_base64")
+        self.check_limits(data)
+        return super().to_internal_value(data)
+
+    def current_paths(self) -> set:
+        """
+        Пути текущего изображения изменяемого объекта и его производных.
+        При создании объекта множество пустое.
+        """
+        instance = getattr(self.parent, "instance", None)
+        value = getattr(instance, self.source, None) if instance else None
+        if not value:
+            return set()
+        urls = [value.url]
+        derivatives = getattr(instance, f"{self.source}_derivatives", None)
+        for derivative in (derivatives or {}).values():
+            urls += [
+                default_storage.url(derivative[ext])
+                for ext in DERIVATIVE_FORMATS
+            ]
+        return {urlsplit(url).path for url in urls}
+
+    def check_limits(self, file):
+        """
+        Проверяет размер файла и количество пикселей до полной
+        загрузки изображения в Pillow.
         """
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        if getattr(file, "size", 0) > max_bytes:
+            self.fail("too_large", max_bytes=max_bytes)
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
         try:
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
-            return data
-        except (ValueError, TypeError):
-            raise serializers.ValidationError("Неверный формат изображения.")
+            pixels = image_pixels(file)
+        except ImageTooLarge:
+            self.fail("too_many_pixels", max_pixels=max_pixels)
+        except (OSError, ValueError, AttributeError):
+            self.fail("invalid_image")
+        if pixels > max_pixels:
+            self.fail("too_many_pixels", max_pixels=max_pixels)
 
     def to_representation(self, value):
         """
-        Преобразует файловый объект в base64-строку.
+        Возвращает путь к изображению или base64-строку по запросу клиента.
         """
-        if value:
-            return base64.b64encode(value.read()).decode("utf-8")
-        return None
+        if not value:
+            return None
+        if self.inline_requested():
+            with value.open("rb") as file:
+                content = base64.b64encode(file.read()).decode("utf-8")
+            mime_type = mimetypes.guess_type(value.name)[0] or "image/png"
+            return f"data:{mime_type};base64,{content}"
+        derivative = self.pick_derivative(value)
+        if derivative is not None:
+            return default_storage.url(derivative[self.DERIVATIVE_FORMAT])
+        return value.url
+
+    def pick_derivative(self, value):
+        """
+        Выбирает наименьшую производную, ширина которой
+        не меньше ширины запрошенного варианта.
+        """
+        variant = self.context.get(self.VARIANT_CONTEXT_KEY, self.variant)
+        derivatives = getattr(
+            value.instance, f"{value.field.name}_derivatives", None
+        )
+        if variant not in DERIVATIVE_SPECS or not derivatives:
+            return None
+        target_width = DERIVATIVE_SPECS[variant][0]
+        candidates = sorted(
+            derivatives.values(), key=lambda derivative: derivative["width"]
+        )
+        for derivative in candidates:
+            if derivative["width"] >= target_width:
+                return derivative
+        return max(candidates, key=lambda derivative: derivative["width"])
+
+    def inline_requested(self):
+        request = self.context.get("request")
+        if request is None:
+            return False
+        value = request.query_params.get(self.INLINE_QUERY_PARAM, "")
+        return value.lower() in self.INLINE_TRUE_VALUES
+
+
+class ImageMetaField(serializers.Field):
+    """
+    Размеры и хэш содержимого изображения рецепта.
+    Значения берутся из колонок модели, файл с диска не читается.
+    В ``variants`` перечислены построенные производные изображения.
+    """
+
+    def __init__(self, image_field="image", **kwargs):
+        self.image_field = image_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        if not getattr(instance, self.image_field):
+            return None
+        derivatives = getattr(instance, f"{self.image_field}_derivatives", {})
+        return {
+            "width": getattr(instance, f"{self.image_field}_width"),
+            "height": getattr(instance, f"{self.image_field}_height"),
+            "hash": getattr(instance, f"{self.image_field}_hash"),
+            "variants": {
+                name: {
+                    "width": derivative["width"],
+                    "height": derivative["height"],
+                    **{
+                        ext: default_storage.url(derivative[ext])
+                        for ext in DERIVATIVE_FORMATS
+                    },
+                }
+                for name, derivative in derivatives.items()
+            },
+        }
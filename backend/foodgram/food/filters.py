@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
 from .models import Recipe
+from .search import ingredient_name_search
 
 
 class RecipeFilter(filters.FilterSet):
@@ -21,8 +22,7 @@ class RecipeFilter(filters.FilterSet):
         label="shopping_cart",
     )
     ingredients = filters.CharFilter(
-        field_name="ingredients__ingredient__name",
-        lookup_expr="icontains",
+        method="get_ingredients",
         label="Ингредиенты",
     )
 
@@ -36,6 +36,12 @@ class RecipeFilter(filters.FilterSet):
             "is_in_shopping_cart",
         )
 
+    def get_ingredients(self, queryset, name, value):
+        """
+        Фильтрует рецепты по вхождению строки в название ингредиента.
+        """
+        return ingredient_name_search.filter_recipes(queryset, value)
+
     def get_is_favorited(self, queryset, name, value):
         """
         Фильтрует рецепты на основе того,
@@ -0,0 +1,83 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class Generation:
+    """
+    Номер поколения данных, общий для всех процессов.
+
+    Номер увеличивается при каждом изменении данных, поэтому ключи кэшей,
+    в которые он входит, после изменения перестают совпадать. Номер
+    хранится в кэше Django, если кэш общий (см. настройку CACHES). Кэш
+    locmem у каждого процесса свой, поэтому с ним номер - время изменения
+    файла в GENERATIONS_DIR: его видят все воркеры на сервере.
+    """
+
+    def __init__(self, name: str, alias: str = "default"):
+        self.name = name
+        self.key = f"generation:{name}"
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def path(self):
+        """Файл поколения, если кэш не общий между процессами."""
+        if not isinstance(self.cache, LocMemCache):
+            return None
+        return Path(settings.GENERATIONS_DIR) / self.name
+
+    def get(self) -> int:
+        path = self.path
+        if path is not None:
+            return self._file_version(path)
+        value = self.cache.get(self.key)
+        if value is None:
+            # После вытеснения ключа счётчик продолжается с текущего
+            # времени, чтобы не повторить уже выданные номера.
+            self.cache.add(self.key, time.time_ns() // 1000, timeout=None)
+            value = self.cache.get(self.key)
+        return value
+
+    async def aget(self) -> int:
+        path = self.path
+        if path is not None:
+            return self._file_version(path)
+        value = await self.cache.aget(self.key)
+        if value is None:
+            await self.cache.aadd(
+                self.key, time.time_ns() // 1000, timeout=None
+            )
+            value = await self.cache.aget(self.key)
+        return value
+
+    def bump(self) -> None:
+        path = self.path
+        if path is not None:
+            version = max(time.time_ns(), self._file_version(path) + 1)
+            os.utime(path, ns=(version, version))
+            return
+        try:
+            self.cache.incr(self.key)
+        except ValueError:
+            self.get()
+
+    @staticmethod
+    def _file_version(path: Path) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+            return os.stat(path).st_mtime_ns
+
+
+catalog_generation = Generation("catalog")
+recipe_generation = Generation("recipes")
@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import Future
+from functools import partial
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from food.generations import recipe_generation
+
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 16
+
+IMAGES_DIR = "images"
+DERIVATIVES_DIR = "images/derivatives"
+# Максимальные размеры (ширина, высота) производных изображений.
+DERIVATIVE_SPECS = {
+    "thumbnail": (160, 160),
+    "card": (480, 480),
+    "full": (1280, 1280),
+}
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+
+
+def image_hash(file) -> str:
+    """
+    Возвращает укороченный sha256 содержимого файла.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def describe_image(file) -> tuple:
+    """
+    Возвращает ширину, высоту и хэш содержимого изображения.
+    """
+    width, height = get_image_dimensions(file)
+    return width, height, image_hash(file)
+
+
+def render_derivatives(source_path: str, target_dir: str, stem: str) -> dict:
+    """
+    Строит производные изображения по DERIVATIVE_SPECS во всех форматах
+    DERIVATIVE_FORMATS и возвращает их описание для Recipe.image_derivatives.
+
+    Выполняется в отдельном процессе, поэтому работает только с путями
+    на диске и не обращается к базе данных.
+    """
+    from PIL import Image, ImageOps
+
+    os.makedirs(target_dir, exist_ok=True)
+    derivatives = {}
+    with Image.open(source_path) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    for name, size in DERIVATIVE_SPECS.items():
+        variant = image.copy()
+        variant.thumbnail(size, Image.LANCZOS)
+        entry = {"width": variant.width, "height": variant.height}
+        for ext, (image_format, options) in DERIVATIVE_FORMATS.items():
+            filename = f"{stem}_{name}.{ext}"
+            variant.save(
+                os.path.join(target_dir, filename), image_format, **options
+            )
+            entry[ext] = f"{DERIVATIVES_DIR}/{filename}"
+        derivatives[name] = entry
+    return derivatives
+
+
+def import_image(
+    data: str, media_root: str, max_bytes: int, max_pixels: int
+) -> dict:
+    """
+    Декодирует изображение из data URI в файл хранилища и возвращает
+    значения полей Recipe: image, image_width, image_height, image_hash.
+
+    Выполняется в отдельном процессе при массовом импорте рецептов,
+    поэтому получает все настройки аргументами.
+    """
+    from PIL import Image
+
+    from food.uploads import ImageTooLarge, parse_data_uri, write_base64
+
+    _, ext, start = parse_data_uri(data, max_bytes)
+    name = f"{IMAGES_DIR}/{uuid.uuid4()}.{ext}"
+    path = os.path.join(media_root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    try:
+        with open(path, "wb") as file:
+            write_base64(data, start, file)
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            raise ImageTooLarge(max_pixels)
+        except Image.UnidentifiedImageError:
+            raise ValueError("Файл не является изображением.")
+        if width * height > max_pixels:
+            raise ImageTooLarge(max_pixels)
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(64 * 1024), b""):
+                digest.update(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return {
+        "image": name,
+        "image_width": width,
+        "image_height": height,
+        "image_hash": digest.hexdigest()[:HASH_LENGTH],
+    }
+
+
+def get_executor():
+    """
+    Пул процессов для обработки изображений, создаётся при первом вызове.
+    multiprocessing импортируется здесь, чтобы не замедлять запуск.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _render_args(image_name: str) -> tuple:
+    return (
+        default_storage.path(image_name),
+        default_storage.path(DERIVATIVES_DIR),
+        os.path.splitext(os.path.basename(image_name))[0],
+    )
+
+
+def submit_derivatives(image_name: str, executor=None) -> Future:
+    """
+    Отправляет изображение из хранилища на обработку в пул процессов.
+    """
+    return (executor or get_executor()).submit(
+        render_derivatives, *_render_args(image_name)
+    )
+
+
+def store_derivatives(recipe_id: int, image_name: str, derivatives: dict):
+    """
+    Сохраняет описание производных, если изображение рецепта
+    не сменилось за время обработки.
+    """
+    from food.models import Recipe
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_derivatives=derivatives
+    )
+    if updated:
+        recipe_generation.bump()
+
+
+def schedule_derivatives(
+    recipe_id: int, image_name: str, executor=None
+) -> Optional[Future]:
+    """
+    Запускает построение производных вне обработчика запроса в executor
+    или в общем пуле. Без executor при IMAGE_PROCESSING_WORKERS = 0
+    изображения обрабатываются сразу.
+    """
+    if executor is None and not settings.IMAGE_PROCESSING_WORKERS:
+        try:
+            derivatives = render_derivatives(*_render_args(image_name))
+        except Exception:
+            logger.exception(
+                f"Не удалось построить производные изображения {image_name}"
+            )
+            return None
+        store_derivatives(recipe_id, image_name, derivatives)
+        return None
+    future = submit_derivatives(image_name, executor)
+    future.add_done_callback(
+        partial(_store_derivatives_callback, recipe_id, image_name)
+    )
+    return future
+
+
+def _store_derivatives_callback(recipe_id, image_name, future):
+    try:
+        store_derivatives(recipe_id, image_name, future.result())
+    except Exception:
+        logger.exception(
+            f"Не удалось построить производные изображения {image_name}"
+        )
+    finally:
+        connection.close()
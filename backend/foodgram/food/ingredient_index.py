@@ -0,0 +1,218 @@
+"""
+Предпостроенный индекс справочника ингредиентов для автодополнения.
+
+Индекс хранится в файле и отображается в память (mmap) только для чтения,
+поэтому все процессы gunicorn используют одни и те же страницы памяти.
+Файл перестраивается при изменении ингредиентов (см. food.signals),
+а процессы подхватывают новую версию, сверяя отметку файла при поиске.
+
+Формат файла (little-endian):
+    заголовок   MAGIC (8 байт), количество записей (uint32);
+    смещения    (количество + 1) * uint32 от начала блока записей;
+    записи      "ключ\\x1fid\\x1fназвание\\x1fединица\\n" в UTF-8,
+                отсортированы по ключу - названию в casefold.
+"""
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Optional
+
+from django.conf import settings
+
+
+MAGIC = b"FGINGR01"
+HEADER = struct.Struct("<8sI")
+OFFSET = struct.Struct("<I")
+FIELD_SEPARATOR = "\x1f"
+RECORD_SEPARATOR = "\n"
+
+
+def normalize(value: str) -> str:
+    return value.casefold()
+
+
+def build_index(path: Optional[str] = None) -> int:
+    """
+    Строит файл индекса из базы данных и атомарно заменяет им прежний.
+    Возвращает количество записей.
+    """
+    from food.models import Ingredient
+
+    path = path or settings.INGREDIENT_INDEX_PATH
+    rows = sorted(
+        (normalize(name), pk, name, unit)
+        for pk, name, unit in Ingredient.objects.values_list(
+            "pk", "name", "measurement_unit"
+        ).iterator()
+    )
+    records = [
+        (
+            FIELD_SEPARATOR.join((key, str(pk), name, unit))
+            + RECORD_SEPARATOR
+        ).encode()
+        for key, pk, name, unit in rows
+    ]
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(records)))
+            file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            file.writelines(records)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(records)
+
+
+class _Snapshot:
+    """Отображённая в память версия файла индекса."""
+
+    def __init__(self, buffer: mmap.mmap):
+        magic, self.count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Неизвестный формат файла индекса ингредиентов.")
+        self.buffer = buffer
+        self.offsets_start = HEADER.size
+        self.data_start = self.offsets_start + OFFSET.size * (self.count + 1)
+
+    def offset(self, index: int) -> int:
+        return OFFSET.unpack_from(
+            self.buffer, self.offsets_start + OFFSET.size * index
+        )[0]
+
+    def record(self, index: int) -> bytes:
+        return self.buffer[
+            self.data_start + self.offset(index):
+            self.data_start + self.offset(index + 1)
+        ]
+
+    def key(self, index: int) -> bytes:
+        record = self.record(index)
+        return record[:record.index(FIELD_SEPARATOR.encode())]
+
+    def row(self, index: int) -> dict:
+        _, pk, name, unit = (
+            self.record(index).decode().rstrip(RECORD_SEPARATOR).split(
+                FIELD_SEPARATOR
+            )
+        )
+        return {"id": int(pk), "name": name, "measurement_unit": unit}
+
+
+class _Keys:
+    """Последовательность ключей для bisect."""
+
+    def __init__(self, snapshot: _Snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, index):
+        return self.snapshot.key(index)
+
+
+class _Offsets:
+    """Последовательность начал записей для bisect."""
+
+    def __init__(self, snapshot: _Snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, index):
+        return self.snapshot.offset(index)
+
+
+class IngredientIndex:
+    """
+    Поиск ингредиентов по началу названия (bisect по отсортированным
+    ключам) и, в режиме ``ranked``, по вхождению подстроки после
+    совпадений по началу.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._snapshot: Optional[_Snapshot] = None
+
+    def search(
+        self, query: str = "", limit: Optional[int] = None, ranked=False
+    ) -> list:
+        snapshot = self._load()
+        needle = normalize(query).encode()
+        matches = self._prefix_matches(snapshot, needle, limit)
+        if ranked and needle and (limit is None or len(matches) < limit):
+            remaining = None if limit is None else limit - len(matches)
+            matches.extend(
+                self._substring_matches(
+                    snapshot, needle, set(matches), remaining
+                )
+            )
+        return [snapshot.row(index) for index in matches]
+
+    def _prefix_matches(self, snapshot, needle, limit) -> list:
+        keys = _Keys(snapshot)
+        index = bisect.bisect_left(keys, needle)
+        matches = []
+        while index < snapshot.count and keys[index].startswith(needle):
+            if limit is not None and len(matches) >= limit:
+                break
+            matches.append(index)
+            index += 1
+        return matches
+
+    def _substring_matches(self, snapshot, needle, exclude, limit) -> list:
+        """
+        Ищет вхождения средствами mmap.find и оставляет только те,
+        что попали в ключ записи.
+        """
+        offsets = _Offsets(snapshot)
+        buffer, data_start = snapshot.buffer, snapshot.data_start
+        matches = []
+        position = data_start
+        while limit is None or len(matches) < limit:
+            position = buffer.find(needle, position)
+            if position == -1:
+                break
+            index = bisect.bisect_right(offsets, position - data_start) - 1
+            record_start = data_start + snapshot.offset(index)
+            key_end = record_start + len(snapshot.key(index))
+            if position + len(needle) <= key_end and index not in exclude:
+                matches.append(index)
+            position = data_start + snapshot.offset(index + 1)
+        return matches
+
+    def _load(self) -> _Snapshot:
+        path = self.path or settings.INGREDIENT_INDEX_PATH
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            build_index(path)
+            stat = os.stat(path)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    with open(path, "rb") as file:
+                        buffer = mmap.mmap(
+                            file.fileno(), 0, access=mmap.ACCESS_READ
+                        )
+                    self._snapshot = _Snapshot(buffer)
+                    self._stamp = stamp
+        return self._snapshot
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,62 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from food.images import store_derivatives, submit_derivatives
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Команда для построения производных изображений
+    у уже загруженных рецептов.
+    """
+
+    help = "Строит производные изображения рецептов (thumbnail, card, full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить производные у всех рецептов, а не только "
+            "у рецептов без них.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.IMAGE_PROCESSING_WORKERS, 1),
+            help="Количество процессов обработки.",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image="")
+        if not options["all"]:
+            recipes = recipes.filter(image_derivatives={})
+        recipes = recipes.values_list("pk", "image")
+
+        done = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {
+                submit_derivatives(image_name, executor): (pk, image_name)
+                for pk, image_name in recipes.iterator()
+            }
+            for future in as_completed(futures):
+                pk, image_name = futures[future]
+                try:
+                    store_derivatives(pk, image_name, future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"Рецепт {pk} ({image_name}): {error}")
+                else:
+                    done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано изображений: {done}, с ошибками: {failed}."
+            )
+        )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from food.ingredient_index import build_index
+
+
+class Command(BaseCommand):
+    """
+    Команда для построения файла индекса ингредиентов.
+    """
+
+    help = "Перестраивает индекс ингредиентов для автодополнения."
+
+    def handle(self, *args, **options):
+        count = build_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс {settings.INGREDIENT_INDEX_PATH}: {count} записей."
+            )
+        )
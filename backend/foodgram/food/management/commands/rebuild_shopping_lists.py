@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from food import shopping_list
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересборки сводных списков покупок по корзинам.
+    """
+
+    help = (
+        "Пересобирает списки покупок (ShoppingListItem) с нуля. "
+        "С --check только сверяет их с корзинами."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Не менять данные, а завершиться с ошибкой "
+            "при расхождениях.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Количество пользователей, обрабатываемых за раз.",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = (
+            User.objects.filter(
+                Q(shopping_user__isnull=False) | Q(shopping_list__isnull=False)
+            )
+            .distinct()
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        user_ids = list(user_ids)
+        chunk_size = options["chunk_size"]
+        drifted = 0
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            with transaction.atomic():
+                expected = shopping_list.expected_items(chunk)
+                stored = shopping_list.stored_items(chunk)
+                mismatched = [
+                    pk for pk in chunk if expected[pk] != stored[pk]
+                ]
+                drifted += len(mismatched)
+                if options["check"]:
+                    for pk in mismatched:
+                        self.stderr.write(
+                            f"Пользователь {pk}: ожидается {expected[pk]}, "
+                            f"сохранено {stored[pk]}."
+                        )
+                elif mismatched:
+                    shopping_list.rebuild(mismatched)
+
+        if options["check"] and drifted:
+            raise CommandError(f"Расхождений в списках покупок: {drifted}.")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проверено пользователей: {len(user_ids)}, "
+                f"расхождений: {drifted}."
+            )
+        )
@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from food.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчёта хранимых счётчиков и исправления расхождений.
+    """
+
+    help = (
+        "Пересчитывает счётчики рецептов, подписчиков, избранного, "
+        "списков покупок и использований ингредиентов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество записей, пересчитываемых за один запрос.",
+        )
+
+    def handle(self, *args, **options):
+        for label, field, related_label, related_field in COUNTERS:
+            repaired = recount(
+                apps,
+                label,
+                field,
+                related_label,
+                related_field,
+                options["chunk_size"],
+            )
+            self.stdout.write(f"{label}.{field}: исправлено {repaired}.")
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны."))
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.3 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+from food.images import describe_image
+
+
+def fill_image_meta(apps, schema_editor):
+    Recipe = apps.get_model("food", "Recipe")
+    for recipe in Recipe.objects.exclude(image="").iterator():
+        try:
+            with recipe.image.open("rb") as file:
+                width, height, content_hash = describe_image(file)
+        except (OSError, ValueError):
+            continue
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_width=width, image_height=height, image_hash=content_hash
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("food", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=16,
+                verbose_name="Хэш изображения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_height",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Высота изображения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_width",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Ширина изображения",
+            ),
+        ),
+        migrations.RunPython(fill_image_meta, migrations.RunPython.noop),
+    ]
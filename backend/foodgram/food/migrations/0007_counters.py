@@ -0,0 +1,48 @@
+# Generated by Django 4.2.3 on 2026-10-17 17:47
+
+from django.db import migrations, models
+
+from food.counters import COUNTERS, recount
+
+
+def fill_counters(apps, schema_editor):
+    for counter in COUNTERS:
+        recount(apps, *counter, chunk_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("food", "0006_recipe_pub_date_id_idx"),
+        ("users", "0002_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="usage_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Использований в рецептах",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Количество добавлений в избранное",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="in_carts_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Количество добавлений в список покупок",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
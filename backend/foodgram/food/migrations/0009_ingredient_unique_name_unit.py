@@ -0,0 +1,86 @@
+# Generated by Django 4.2.3 on 2026-10-17 19:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Оставляет у каждой пары (название, единица измерения) ингредиент
+    с наименьшим id и переносит на него строки рецептов и списков покупок.
+    """
+    Ingredient = apps.get_model("food", "Ingredient")
+    RecipeIngredient = apps.get_model("food", "RecipeIngredient")
+    ShoppingListItem = apps.get_model("food", "ShoppingListItem")
+    groups = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(keep=Min("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in groups.iterator():
+        keep = group["keep"]
+        duplicates = list(
+            Ingredient.objects.filter(
+                name=group["name"], measurement_unit=group["measurement_unit"]
+            )
+            .exclude(pk=keep)
+            .values_list("pk", flat=True)
+        )
+        _merge_rows(RecipeIngredient, "recipe_id", "amount", keep, duplicates)
+        _merge_rows(
+            ShoppingListItem, "user_id", "total_amount", keep, duplicates
+        )
+        Ingredient.objects.filter(pk__in=duplicates).delete()
+        Ingredient.objects.filter(pk=keep).update(
+            usage_count=RecipeIngredient.objects.filter(
+                ingredient_id=keep
+            ).count()
+        )
+
+
+def _merge_rows(model, owner, amount, keep, duplicates):
+    """
+    Переносит строки с дубликатов на ингредиент keep, складывая количество,
+    если у владельца строка с keep уже есть.
+    """
+    kept = {
+        getattr(row, owner): row
+        for row in model.objects.filter(ingredient_id=keep)
+    }
+    for row in model.objects.filter(ingredient_id__in=duplicates):
+        target = kept.get(getattr(row, owner))
+        if target is None:
+            row.ingredient_id = keep
+            row.save(update_fields=["ingredient"])
+            kept[getattr(row, owner)] = row
+        else:
+            setattr(
+                target, amount, getattr(target, amount) + getattr(row, amount)
+            )
+            target.save(update_fields=[amount])
+            row.delete()
+
+
+class Migration(migrations.Migration):
+    # Объединение дубликатов и создание ограничения выполняются в разных
+    # транзакциях: PostgreSQL не изменяет таблицу с отложенными проверками
+    # внешних ключей от только что удалённых строк.
+    atomic = False
+
+    dependencies = [
+        ("food", "0008_shopping_list_item"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="uq_ingredient_name_unit",
+            ),
+        ),
+    ]
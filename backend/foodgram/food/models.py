@@ -1,8 +1,12 @@
+from functools import partial
+
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
 from users.models import User
 
+from .images import describe_image, schedule_derivatives
+
 
 class Ingredient(models.Model):
     """
@@ -13,8 +17,19 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         "Единицы измерения", max_length=50, blank=False
     )
+    usage_count = models.PositiveIntegerField(
+        "Использований в рецептах", default=0, editable=False
+    )
 
     class Meta:
+        # На PostgreSQL у name есть GIN-индекс pg_trgm для поиска
+        # по подстроке (food.search), он создаётся миграцией 0005.
+        constraints = (
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="uq_ingredient_name_unit",
+            ),
+        )
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
 
@@ -57,6 +72,18 @@ class Recipe(models.Model):
     image = models.ImageField(
         "Изображение блюда", upload_to="images/", blank=False
     )
+    image_width = models.PositiveIntegerField(
+        "Ширина изображения", null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота изображения", null=True, blank=True, editable=False
+    )
+    image_hash = models.CharField(
+        "Хэш изображения", max_length=16, blank=True, editable=False
+    )
+    image_derivatives = models.JSONField(
+        "Производные изображения", default=dict, blank=True, editable=False
+    )
     text = models.TextField("Описание рецепта", max_length=500, blank=False)
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -81,15 +108,41 @@ class Recipe(models.Model):
         verbose_name="Дата публикации рецепта",
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        "Количество добавлений в избранное", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "Количество добавлений в список покупок", default=0, editable=False
+    )
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_id_idx"
+            ),
+        )
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        image_changed = bool(self.image) and not self.image._committed
+        if image_changed:
+            (
+                self.image_width,
+                self.image_height,
+                self.image_hash,
+            ) = describe_image(self.image)
+            self.image_derivatives = {}
+        super().save(*args, **kwargs)
+        if image_changed:
+            transaction.on_commit(
+                partial(schedule_derivatives, self.pk, self.image.name)
+            )
+
 
 class RecipeIngredient(models.Model):
     """
@@ -200,3 +253,41 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"Рецепт {self.recipe} у пользователя {self.user}"
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель для представления суммарного количества ингредиента
+    во всех рецептах списка покупок пользователя.
+    Поддерживается сервисом food.shopping_list.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_list",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="shopping_list_items",
+    )
+    total_amount = models.PositiveIntegerField("Количество")
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="uq_shopping_list_user_ingredient",
+            ),
+        )
+        verbose_name = "Ингредиент списка покупок"
+        verbose_name_plural = "Ингредиенты списков покупок"
+
+    def __str__(self):
+        return (
+            f"{self.user}: {self.ingredient.name} - {self.total_amount} "
+            f"{self.ingredient.measurement_unit}"
+        )
@@ -0,0 +1,60 @@
+from django.db import models
+from django.db.models import Exists, OuterRef
+from django.db.models.lookups import IContains
+
+from .models import Ingredient, RecipeIngredient
+
+
+@models.CharField.register_lookup
+class TrigramIContains(IContains):
+    """
+    Поиск подстроки без учёта регистра.
+
+    На PostgreSQL выполняется как ``ILIKE``, которое обслуживает
+    GIN-индекс pg_trgm (миграция food.0005). В остальных СУБД,
+    например в SQLite для тестов, работает как обычный icontains.
+    """
+
+    lookup_name = "trgm_icontains"
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        lhs_sql, lhs_params = compiler.compile(self.lhs)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs_sql} ILIKE {rhs_sql}", (*lhs_params, *rhs_params)
+
+
+class IngredientNameSearch:
+    """
+    Фильтрация рецептов по названию ингредиента.
+
+    Сначала по индексу находятся идентификаторы подходящих ингредиентов,
+    затем рецепты отбираются полусоединением (EXISTS), поэтому запрос
+    рецептов не размножает строки и не требует DISTINCT.
+    """
+
+    lookup = "name__trgm_icontains"
+
+    def matching_ingredient_ids(self, term: str) -> list:
+        return list(
+            Ingredient.objects.filter(**{self.lookup: term}).values_list(
+                "pk", flat=True
+            )
+        )
+
+    def filter_recipes(self, queryset, term: str):
+        ingredient_ids = self.matching_ingredient_ids(term)
+        if not ingredient_ids:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=OuterRef("pk"), ingredient_id__in=ingredient_ids
+                )
+            )
+        )
+
+
+ingredient_name_search = IngredientNameSearch()
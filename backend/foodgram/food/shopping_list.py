@@ -0,0 +1,201 @@
+"""
+Сводный список покупок пользователя (ShoppingListItem).
+
+Список меняется вместе со списком рецептов пользователя (ShoppingCart)
+и с составом рецептов, которые в нём лежат, в той же транзакции.
+Изменения одного пользователя выполняются под блокировкой его строки,
+чтобы параллельные запросы не создали одну позицию дважды.
+Изменения через API и через админку (food.admin) вызывают функции этого
+модуля явно. Команда rebuild_shopping_lists пересобирает списки с нуля.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterable
+
+from django.db.models import Sum
+
+from users.models import User
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def recipe_amounts(recipe_id: int) -> dict:
+    """
+    Количество каждого ингредиента рецепта: {ingredient_id: amount}.
+    """
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id=recipe_id).values_list(
+            "ingredient_id", "amount"
+        )
+    )
+
+
+def apply(user_ids: Iterable[int], deltas: dict) -> None:
+    """
+    Прибавляет к спискам покупок пользователей количества из deltas
+    ({ingredient_id: изменение}); позиции с нулевым итогом удаляются.
+    Вызывается внутри транзакции.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = sorted(set(user_ids))
+    if not deltas or not user_ids:
+        return
+    list(
+        User.objects.select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(
+                        ShoppingListItem(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=delta,
+                        )
+                    )
+                continue
+            item.total_amount += delta
+            if item.total_amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ("total_amount",))
+    ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def recipes_amounts(recipe_ids: Iterable[int]) -> dict:
+    """
+    Суммарное количество ингредиентов нескольких рецептов.
+    """
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values_list("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+
+def add_recipe(user_id: int, recipe_id: int) -> None:
+    """Рецепт добавлен в список покупок пользователя."""
+    add_recipes(user_id, [recipe_id])
+
+
+def remove_recipe(user_id: int, recipe_id: int) -> None:
+    """Рецепт убран из списка покупок пользователя."""
+    remove_recipes(user_id, [recipe_id])
+
+
+def add_recipes(user_id: int, recipe_ids: Iterable[int]) -> None:
+    apply([user_id], recipes_amounts(recipe_ids))
+
+
+def remove_recipes(user_id: int, recipe_ids: Iterable[int]) -> None:
+    amounts = recipes_amounts(recipe_ids)
+    apply([user_id], {pk: -amount for pk, amount in amounts.items()})
+
+
+def clear(user_id: int) -> None:
+    """Корзина пользователя очищена."""
+    ShoppingListItem.objects.filter(user_id=user_id).delete()
+
+
+def recipe_changed(
+    recipe_id: int, old_amounts: dict, new_amounts: dict
+) -> None:
+    """
+    Состав рецепта изменился с old_amounts на new_amounts
+    (см. recipe_amounts). Обновляет списки всех, у кого рецепт в корзине.
+    """
+    deltas = {
+        pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+        for pk in old_amounts.keys() | new_amounts.keys()
+    }
+    apply(cart_user_ids(recipe_id), deltas)
+
+
+def recipe_deleted(recipe_id: int) -> None:
+    """Рецепт будет удалён: убирает его из списков покупок."""
+    amounts = recipe_amounts(recipe_id)
+    apply(
+        cart_user_ids(recipe_id),
+        {pk: -amount for pk, amount in amounts.items()},
+    )
+
+
+@contextmanager
+def tracking_recipes(recipe_ids: Iterable[int]):
+    """
+    Обновляет списки покупок по изменению состава рецептов внутри блока
+    (например, при сохранении ингредиентов в админке). Вызывается внутри
+    транзакции.
+    """
+    old_amounts = {pk: recipe_amounts(pk) for pk in set(recipe_ids)}
+    yield
+    for pk, amounts in old_amounts.items():
+        recipe_changed(pk, amounts, recipe_amounts(pk))
+
+
+def cart_user_ids(recipe_id: int) -> list:
+    return list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+def expected_items(user_ids: Iterable[int]) -> dict:
+    """
+    Списки покупок, посчитанные заново по корзинам:
+    {user_id: {ingredient_id: total_amount}}.
+    """
+    totals = defaultdict(dict)
+    rows = (
+        RecipeIngredient.objects.filter(
+            recipe__shopping_recipe__user_id__in=user_ids
+        )
+        .values_list("recipe__shopping_recipe__user_id", "ingredient_id")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for user_id, ingredient_id, total in rows:
+        totals[user_id][ingredient_id] = total
+    return totals
+
+
+def stored_items(user_ids: Iterable[int]) -> dict:
+    totals = defaultdict(dict)
+    rows = ShoppingListItem.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "ingredient_id", "total_amount"
+    )
+    for user_id, ingredient_id, total in rows:
+        totals[user_id][ingredient_id] = total
+    return totals
+
+
+def rebuild(user_ids: Iterable[int]) -> None:
+    """
+    Пересобирает списки покупок пользователей по их корзинам.
+    Вызывается внутри транзакции.
+    """
+    user_ids = list(user_ids)
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+        )
+        for user_id, totals in expected_items(user_ids).items()
+        for ingredient_id, total in totals.items()
+    )
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Follow, User
+
+from .counters import adjust, is_suppressed
+from .generations import catalog_generation, recipe_generation
+from .ingredient_index import build_index
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag,)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_ingredient_index(sender, **kwargs):
+    """
+    Перестраивает индекс ингредиентов после фиксации транзакции.
+    """
+    transaction.on_commit(build_index)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_catalog_generation(sender, **kwargs):
+    """
+    Сбрасывает кэш справочников после фиксации транзакции.
+    """
+    transaction.on_commit(catalog_generation.bump)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_recipe_generation(sender, **kwargs):
+    """
+    Сбрасывает кэш ответов с рецептами после фиксации транзакции.
+    """
+    transaction.on_commit(recipe_generation.bump)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_generation_on_tags(sender, action, **kwargs):
+    if action.startswith("post_"):
+        transaction.on_commit(recipe_generation.bump)
+
+
+def _counter_delta(kwargs) -> int:
+    """
+    +1 при создании записи, -1 при удалении, 0 при изменении
+    и внутри counters.suppressed().
+    """
+    if is_suppressed():
+        return 0
+    if "created" not in kwargs:
+        return -1
+    return 1 if kwargs["created"] else 0
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def count_author_recipes(sender, instance, **kwargs):
+    delta = _counter_delta(kwargs)
+    if delta:
+        adjust(User, [instance.author_id], "recipes_count", delta)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_author_followers(sender, instance, **kwargs):
+    delta = _counter_delta(kwargs)
+    if delta:
+        adjust(User, [instance.author_id], "followers_count", delta)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def count_recipe_favorites(sender, instance, **kwargs):
+    delta = _counter_delta(kwargs)
+    if delta:
+        adjust(Recipe, [instance.recipe_id], "favorites_count", delta)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def count_recipe_carts(sender, instance, **kwargs):
+    delta = _counter_delta(kwargs)
+    if delta:
+        adjust(Recipe, [instance.recipe_id], "in_carts_count", delta)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def count_ingredient_usage(sender, instance, **kwargs):
+    delta = _counter_delta(kwargs)
+    if delta:
+        adjust(Ingredient, [instance.ingredient_id], "usage_count", delta)
@@ -0,0 +1,137 @@
+import binascii
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+# Размер порции base64-текста, декодируемой за один шаг (кратен 4).
+BASE64_CHUNK_SIZE = 64 * 1024
+DATA_URI_HEADER = re.compile(
+    r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+);base64,"
+)
+WHITESPACE = re.compile(r"\s+")
+
+
+class ImageTooLarge(ValueError):
+    """Изображение превышает допустимый размер."""
+
+
+def image_pixels(file) -> int:
+    """
+    Возвращает количество пикселей изображения, читая только его заголовок.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise ImageTooLarge(settings.IMAGE_UPLOAD_MAX_PIXELS)
+    finally:
+        file.seek(0)
+    return width * height
+
+
+def estimated_decoded_size(payload_length: int) -> int:
+    """
+    Оценка размера данных после декодирования base64 без самого декодирования.
+    """
+    return payload_length * 3 // 4
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    """
+    Временный файл с декодированным изображением.
+
+    Хранилище перемещает такой файл вместо копирования, поэтому при сборке
+    мусора он закрывается с проверкой, что файл на диске уже перемещён.
+    """
+
+    def __del__(self):
+        self.close()
+
+
+def parse_data_uri(data: str, max_bytes: int) -> tuple:
+    """
+    Проверяет заголовок data URI и размер данных до декодирования.
+    Возвращает MIME-тип, расширение файла и начало base64-данных.
+    """
+    header = DATA_URI_HEADER.match(data[:256])
+    if header is None:
+        raise ValueError("Ожидается строка вида data:image/...;base64,...")
+    start = header.end()
+    if estimated_decoded_size(len(data) - start) > max_bytes:
+        raise ImageTooLarge(max_bytes)
+    content_type = header.group("content_type")
+    ext = content_type.split("/")[-1]
+    if ext.startswith("svg"):
+        ext = "svg"
+    return content_type, ext, start
+
+
+def write_base64(data: str, start: int, file) -> int:
+    """
+    Декодирует base64 из data[start:] порциями в файл.
+    Возвращает количество записанных байт.
+    """
+    size = 0
+    tail = ""
+    for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+        chunk = tail + data[offset:offset + BASE64_CHUNK_SIZE]
+        if WHITESPACE.search(chunk):
+            chunk = WHITESPACE.sub("", chunk)
+        usable = len(chunk) - len(chunk) % 4
+        tail = chunk[usable:]
+        decoded = binascii.a2b_base64(chunk[:usable])
+        size += len(decoded)
+        file.write(decoded)
+    if tail:
+        raise binascii.Error("Некорректная длина base64-строки.")
+    return size
+
+
+def decode_data_uri(data: str) -> DecodedImageFile:
+    """
+    Декодирует data URI с base64 порциями сразу во временный файл.
+
+    Размер проверяется по длине строки до начала декодирования,
+    поэтому слишком большое изображение не попадает ни в память, ни на диск.
+    """
+    content_type, ext, start = parse_data_uri(
+        data, settings.IMAGE_UPLOAD_MAX_BYTES
+    )
+    file = DecodedImageFile(f"{uuid.uuid4()}.{ext}", content_type, 0, None)
+    try:
+        size = write_base64(data, start, file)
+    except ValueError:
+        file.close()
+        raise ValueError("Некорректная base64-строка.")
+    file.size = size
+    file.seek(0)
+    return file
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемые файлы сразу во временный файл на диске и перестаёт
+    сохранять данные, как только превышен IMAGE_UPLOAD_MAX_BYTES.
+
+    Итоговый размер файла сохраняет фактически полученное количество байт,
+    чтобы поле сериализатора могло отклонить его с понятной ошибкой.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return super().file_complete(self.received)
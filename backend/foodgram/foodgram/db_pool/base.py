@@ -0,0 +1,88 @@
+"""
+Бэкенд PostgreSQL, который берёт соединения из пула процесса
+(foodgram.db_pool.pool) и возвращает их туда вместо закрытия.
+
+Настройки пула задаются ключом POOL подключения в DATABASES:
+MIN_SIZE, MAX_SIZE, TIMEOUT (ожидание свободного соединения, с)
+и MAX_AGE (время жизни соединения, с). CONN_MAX_AGE при этом должен
+быть 0: Django отдаёт соединение в пул в конце каждого запроса.
+"""
+from functools import partial
+
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN,)
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import ConnectionPool, PoolTimeout, get_pool
+
+
+def close_connection(connection):
+    connection.close()
+
+
+def reset_connection(connection) -> bool:
+    """Откатывает незавершённую транзакцию перед возвратом в пул."""
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+def check_connection(connection) -> bool:
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    if not connection.autocommit:
+        connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self) -> ConnectionPool:
+        return get_pool(self.alias, self.create_pool)
+
+    def create_pool(self) -> ConnectionPool:
+        options = self.settings_dict.get("POOL", {})
+        return ConnectionPool(
+            name=self.alias,
+            close=close_connection,
+            reset=reset_connection,
+            check=(
+                check_connection
+                if self.settings_dict["CONN_HEALTH_CHECKS"]
+                else None
+            ),
+            min_size=options.get("MIN_SIZE", 0),
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 30),
+            max_age=options.get("MAX_AGE"),
+        )
+
+    def get_new_connection(self, conn_params):
+        try:
+            connection = self.pool.acquire(
+                partial(super().get_new_connection, conn_params)
+            )
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+        # Родительский метод выставляет уровень изоляции только
+        # для новых соединений, у взятых из пула он тот же.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,262 @@
+"""
+Пул соединений с базой данных в памяти процесса.
+
+Пул не зависит от драйвера: соединения открываются, проверяются,
+сбрасываются и закрываются переданными функциями. min_size соединений
+открывается при первом обращении, дальше пул растёт до max_size по мере
+спроса. Каждое ожидание свободного соединения пишется в лог, счётчики
+ожидания и загрузки возвращает pool_stats(). Один пул обслуживает
+все потоки процесса (WSGI-потоки и потоки sync_to_async под ASGI).
+После fork дочерний процесс начинает с пустого пула и не трогает
+унаследованные сокеты родителя.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не освободилось за время ожидания."""
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        name: str,
+        close: Callable,
+        reset: Callable,
+        check: Optional[Callable] = None,
+        min_size: int = 0,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        max_age: Optional[float] = None,
+    ):
+        self.name = name
+        self._close = close
+        self._reset = reset
+        self._check = check
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_age = max_age
+        self._condition = threading.Condition()
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        # Свободные соединения: (соединение, время открытия).
+        self._idle = deque()
+        # Выданные соединения: id -> время открытия.
+        self._in_use = {}
+        self._opening = 0
+        self._waiting = 0
+        self._warmed = False
+        self.counters = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "opened": 0,
+            "closed": 0,
+        }
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def acquire(self, connect: Callable):
+        """
+        Возвращает свободное соединение, открывает новое функцией connect,
+        если пул не заполнен, или ждёт освобождения не дольше timeout.
+        """
+        if self._pid != os.getpid():
+            with self._condition:
+                self._start()
+        self._warm_up(connect)
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            with self._condition:
+                connection, expired, wait = self._reserve(deadline)
+            waited = waited or wait
+            for stale in expired:
+                self._discard(stale)
+            if connection is None:
+                connection = self._open(connect)
+                break
+            if self._check is None or self._safe(self._check, connection):
+                break
+            self._forget(connection)
+            self._discard(connection)
+        with self._condition:
+            self.counters["acquired"] += 1
+            if waited:
+                wait = time.monotonic() - started
+                self.counters["waited"] += 1
+                self.counters["wait_seconds"] += wait
+        if waited:
+            logger.warning(
+                f"Ожидание соединения пула {self.name}: {wait:.3f} с."
+            )
+        return connection
+
+    def release(self, connection):
+        """
+        Возвращает соединение в пул. Сломанные, устаревшие и чужие
+        соединения закрываются.
+        """
+        with self._condition:
+            if self._pid != os.getpid():
+                return
+            opened = self._in_use.get(id(connection))
+        if (
+            opened is None
+            or self._expired(opened)
+            or not self._safe(self._reset, connection)
+        ):
+            self._forget(connection)
+            self._discard(connection)
+            return
+        with self._condition:
+            del self._in_use[id(connection)]
+            self._idle.append((connection, opened))
+            self._condition.notify()
+
+    def close_all(self):
+        """Закрывает свободные соединения; выданные закроются при возврате."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> dict:
+        with self._condition:
+            in_use = len(self._in_use)
+            return {
+                "size": self.size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "utilization": in_use / self.max_size,
+                **self.counters,
+            }
+
+    def _reserve(self, deadline: float) -> tuple:
+        """
+        Вызывается под блокировкой. Берёт свободное соединение или
+        резервирует место под новое (тогда соединение None), при
+        необходимости дожидаясь освобождения. Возвращает также устаревшие
+        соединения, которые нужно закрыть, и признак ожидания.
+        """
+        expired = []
+        waited = False
+        while True:
+            while self._idle:
+                connection, opened = self._idle.pop()
+                if self._expired(opened):
+                    expired.append(connection)
+                    continue
+                self._in_use[id(connection)] = opened
+                return connection, expired, waited
+            if self.size < self.max_size:
+                self._opening += 1
+                return None, expired, waited
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.counters["timeouts"] += 1
+                raise PoolTimeout(
+                    f"Нет свободного соединения за {self.timeout} с "
+                    f"(занято {len(self._in_use)} из {self.max_size})."
+                )
+            waited = True
+            self._waiting += 1
+            try:
+                self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _open(self, connect: Callable):
+        """Открывает соединение на зарезервированное место."""
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opening -= 1
+            self._in_use[id(connection)] = time.monotonic()
+            self.counters["opened"] += 1
+        return connection
+
+    def _warm_up(self, connect: Callable):
+        """Открывает min_size соединений при первом обращении к пулу."""
+        if self._warmed:
+            return
+        with self._condition:
+            if self._warmed:
+                return
+            self._warmed = True
+            count = max(self.min_size - self.size, 0)
+            self._opening += count
+        for opened in range(count):
+            try:
+                connection = self._open(connect)
+            except BaseException:
+                with self._condition:
+                    self._opening -= count - opened - 1
+                raise
+            self.release(connection)
+
+    def _forget(self, connection):
+        with self._condition:
+            self._in_use.pop(id(connection), None)
+            self._condition.notify()
+
+    def _discard(self, connection):
+        self._safe(self._close, connection)
+        with self._condition:
+            self.counters["closed"] += 1
+
+    def _expired(self, opened: float) -> bool:
+        return (
+            self.max_age is not None
+            and time.monotonic() - opened > self.max_age
+        )
+
+    @staticmethod
+    def _safe(function: Callable, connection) -> bool:
+        try:
+            return function(connection) is not False
+        except Exception:
+            return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, factory: Callable) -> ConnectionPool:
+    """Возвращает пул подключения alias, создавая его вызовом factory."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = factory()
+    return pool
+
+
+def pool_stats() -> dict:
+    """Состояние пулов этого процесса по подключениям."""
+    return {alias: pool.stats() for alias, pool in _pools.items()}
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -35,12 +36,15 @@ INSTALLED_APPS = [
     "api.apps.ApiConfig",
     "food.apps.FoodConfig",
     "users.apps.UsersConfig",
+    "core.apps.CoreConfig",
 ]
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 CORS_URLS_REGEX = r"^/api/.*$"
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.middleware.SQLInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -73,7 +77,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 6,
@@ -84,6 +88,7 @@ REST_FRAMEWORK = {
 
 DJOSER = {
     "LOGIN_FIELD": "email",
+    "LOGOUT_ON_PASSWORD_CHANGE": True,
     "USER_ID_FIELD": "id",
     "SERIALIZERS": {
         "user_create": "api.serializers.CustomUserCreateSerializer",
@@ -106,9 +111,31 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("POSTGRES_PORT", 5432),
+        # Время жизни соединения между запросами, с
+        # (0 - закрывать после каждого запроса).
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": (
+            os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() == "true"
+        ),
     }
 }
 
+# Пул соединений в памяти процесса (только PostgreSQL). Соединения
+# переиспользует пул, поэтому Django закрывает их после каждого запроса.
+if os.getenv("DB_POOL", "false").lower() == "true":
+    DATABASES["default"].update(
+        {
+            "ENGINE": "foodgram.db_pool",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 0)),
+                "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+                "MAX_AGE": float(os.getenv("DB_POOL_MAX_AGE", 1800)),
+            },
+        }
+    )
+
 AUTH_USER_MODEL = "users.User"
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -140,19 +167,139 @@ STATIC_ROOT = "/app/static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media/"
 
+# Количество процессов для построения производных изображений рецептов.
+# При 0 изображения обрабатываются сразу после сохранения рецепта.
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", 2))
+
+# Ограничения на загружаемые изображения рецептов.
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv("IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", 40_000_000))
+# JSON-тело с изображением в base64 примерно на треть больше самого файла.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    "food.uploads.LimitedTemporaryFileUploadHandler",
+]
+
+# Файл индекса ингредиентов для автодополнения, общий для всех процессов.
+INGREDIENT_INDEX_PATH = os.getenv(
+    "INGREDIENT_INDEX_PATH",
+    os.path.join(tempfile.gettempdir(), "foodgram_ingredient_index.bin"),
+)
+
+# Кэш выгруженных списков покупок и шрифт с кириллицей для PDF.
+SHOPPING_LIST_CACHE_DIR = os.getenv(
+    "SHOPPING_LIST_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "foodgram_shopping_lists"),
+)
+# Предельный размер этого кэша: сверх него удаляются файлы, которые
+# дольше всех не запрашивали.
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv("SHOPPING_LIST_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+# Бэкенд кэша Django: locmem (по умолчанию), file или memcached.
+# С locmem у каждого процесса свой кэш, а номера поколений данных
+# (food.generations) хранятся в файлах GENERATIONS_DIR, общих для
+# воркеров одного сервера. Для нескольких серверов нужен memcached.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHE_LOCATIONS = {
+    "locmem": "foodgram",
+    "file": os.path.join(tempfile.gettempdir(), "foodgram_cache"),
+    "memcached": "127.0.0.1:11211",
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", CACHE_LOCATIONS[CACHE_BACKEND]
+        ),
+    }
+}
+GENERATIONS_DIR = os.getenv(
+    "GENERATIONS_DIR",
+    os.path.join(tempfile.gettempdir(), "foodgram_generations"),
+)
+
+# Кэш ответов со списком и страницей рецептов для анонимных пользователей.
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+
+# Кэш ответов справочников (теги, ингредиенты) в памяти процесса.
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", 0))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 1024))
+
+# Кэш токенов аутентификации с пользователями, время жизни записи, с
+# (0 - проверять токен в базе при каждом запросе). Требует общего для
+# всех процессов бэкенда кэша (CACHE_BACKEND=memcached, для одного
+# сервера - file): отзыв токена при выходе или смене пароля должен сразу
+# стать виден всем воркерам. С locmem кэш по умолчанию выключен,
+# а включить его не даёт проверка api.E001 (api.checks).
+AUTH_TOKEN_CACHE_ALIAS = "default"
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv(
+        "AUTH_TOKEN_CACHE_TIMEOUT", 0 if CACHE_BACKEND == "locmem" else 60
+    )
+)
+
+# Асинхронные GET-обработчики чтения (api.async_views); включаются
+# при запуске под ASGI (SERVER_MODE=asgi в docker-entrypoint.sh).
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "false").lower() == "true"
+
+# Порог медленного запроса (core.middleware.SQLInstrumentationMiddleware):
+# количество SQL-запросов и время базы, мс (0 - без проверки). Такие
+# запросы пишутся в SLOW_REQUEST_LOG_FILE, в записи - до
+# SLOW_REQUEST_TOP_QUERIES самых затратных SQL-запросов.
+SLOW_REQUEST_QUERY_COUNT = int(os.getenv("SLOW_REQUEST_QUERY_COUNT", 50))
+SLOW_REQUEST_DB_TIME_MS = int(os.getenv("SLOW_REQUEST_DB_TIME_MS", 500))
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv("SLOW_REQUEST_TOP_QUERIES", 5))
+SLOW_REQUEST_LOG_FILE = os.getenv("SLOW_REQUEST_LOG_FILE", "slow_requests.log")
+
+# Каталог файлов метрик запросов для нескольких процессов (core.metrics);
+# без него метрики (/api/metrics/) считаются в памяти процесса.
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+# Допустимое время от запуска процесса до первого ответа, мс
+# (manage.py startup_profile, make startup-check; 0 - без ограничения).
+STARTUP_TIME_BUDGET_MS = int(os.getenv("STARTUP_TIME_BUDGET_MS", 1500))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
     "handlers": {
         "file": {
             "level": "DEBUG",
             "class": "logging.FileHandler",
             "filename": "errors.log",
         },
+        "slow_requests": {
+            "class": "logging.FileHandler",
+            "filename": SLOW_REQUEST_LOG_FILE,
+            "formatter": "message",
+            "delay": True,
+        },
     },
     "loggers": {
+        "slow_requests": {
+            "handlers": ["slow_requests"],
+            "level": "INFO",
+            "propagate": False,
+        },
         "": {
             "handlers": ["file"],
             "level": "DEBUG",
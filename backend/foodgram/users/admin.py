@@ -18,6 +18,8 @@ class UserAdmin(admin.ModelAdmin):
         "first_name",
         "last_name",
         "role",
+        "recipes_count",
+        "followers_count",
     )
     search_fields = ("username",)
 
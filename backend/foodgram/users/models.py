@@ -64,6 +64,16 @@ class User(AbstractUser):
         max_length=150,
         help_text="Введите пароль",
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов",
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков",
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         swappable = "AUTH_USER_MODEL"